@@ -1,23 +1,31 @@
 #!/usr/bin/python3
 
+import asyncio
+import threading
 import pkg_resources
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
-from sklearn.decomposition import PCA
 from gensim.models.doc2vec import Doc2Vec
 from partyembed.utils.labels import party_labels, party_tags
-from partyembed.utils.guided import custom_projection_2D
+from partyembed.utils.guided import custom_projection_2D, lexicon_axes_2D
 from partyembed.utils.polarization import polarization_metric
 from partyembed.utils.interpret import Interpret
 from partyembed.utils.issues import issue_ownership
+from partyembed.utils.speeches import SpeechStore
+from partyembed.utils.artifact import PartyVectors, is_artifact
+from partyembed.utils.similarity import party_similarity, WordIndex
+from partyembed.utils.export import export_word_scores, word_scores
+from partyembed.utils.decomposition import pca_backend, reverse_scale, PCA_METHODS
+from partyembed.utils.rolling import rolling_placement
 from partyembed.validate import Validate
+from concurrent.futures import ThreadPoolExecutor
 
 MODEL_PATH = pkg_resources.resource_filename('partyembed', 'models/')
 
 class Explore(object):
 
-    def __init__(self, model='House', method='pca', dimensions=2, country='USA', custom_lexicon=None, chamber=None):
+    def __init__(self, model='House', method='pca', dimensions=2, country='USA', custom_lexicon=None, chamber=None, batch_size=None, max_workers=None):
 
         if type(model)==str:
             if model=='House':
@@ -36,59 +44,90 @@ class Explore(object):
                 self.model = Doc2Vec.load(MODEL_PATH + 'uk200')
                 self.country = 'UK'
                 self.chamber = None
+            elif is_artifact(model):
+                self.model = PartyVectors(model)
+                self.country = self.model.country
+                self.chamber = self.model.chamber
             else:
-                raise ValueError("Model must be House, Senate, Canada or UK, but you entered %s." % model)
+                raise ValueError("Model must be House, Senate, Canada, UK or an artifact directory, but you entered %s." % model)
         elif type(model)==Doc2Vec:
             self.model = model
             self.country = country
             self.chamber = chamber
+        elif type(model)==PartyVectors:
+            self.model = model
+            self.country = model.country
+            self.chamber = model.chamber
         else:
-            raise ValueError("Model must be either a string or a Doc2Vec object.")
+            raise ValueError("Model must be either a string, a Doc2Vec or a PartyVectors object.")
         self.custom_lexicon = custom_lexicon
         self.M = self.model.vector_size
         self.reverse_dim1 = False; self.reverse_dim2 = False
         self.method = method
+        self.batch_size = batch_size
         self.label_dict = party_labels(self.country)
         self.fullnames, self.parties, self.cols, self.mkers = party_tags(self.model, self.country)
         self.labels = [self.label_dict[p] for p in self.parties]
         self.P = len(self.parties)
         self.components = dimensions
-        self.placement = self.dimension_reduction()
+        self._placement = self.dimension_reduction()
+        newvars = self._placement.party_label.str.split(n=1,expand=True)
+        self._placement['year'] = newvars[1].astype(float)
+        self._placement['party'] = self.fullnames
+        self._placement['color'] = self.cols
+        # Gensim allocates normalized vectors on the first similarity query; doing it once
+        # here means concurrent queries never write to the shared model.
+        self.model.wv.init_sims()
+        # Cached structures are built outside any lock and published with one atomic
+        # setdefault, so a slow build never blocks other queries.
+        self._interpreters = {}
+        self._similarity = {}
+        self._word_index = {}
+        self._full_model_lock = threading.Lock()
+        self._executor_lock = threading.Lock()
+        self.max_workers = max_workers
+        self._executor = None
+
+    @property
+    def placement(self):
+        # Queries receive a copy, so the precomputed placement is never modified.
+        return self._placement[['dim1', 'dim2', 'party_label']].copy()
 
     def dimension_reduction(self):
 
         z=np.zeros(( self.P, self.M ))
         for i in range( self.P ):
             z[i,:] = self.model.docvecs[self.parties[i]]
-        if self.method=='pca':
-            self.dr = PCA(n_components=self.components)
+        if self.method in PCA_METHODS:
+            self.dr = pca_backend(self.method, n_components=self.components, batch_size=self.batch_size)
             self.Z = self.dr.fit_transform(z)
         elif self.method=='guided':
-            self.Z = custom_projection_2D(z, self.model, custom_lexicon = self.custom_lexicon)
+            self.Z = custom_projection_2D(z, self.model_for(self.custom_lexicon), custom_lexicon = self.custom_lexicon)
         else:
-            raise ValueError("Model must be pca or guided.")
+            raise ValueError("Method must be guided or one of %s." % ', '.join(PCA_METHODS))
         Z = pd.DataFrame(self.Z)
         Z.columns = ['dim1', 'dim2']
         Z['party_label'] = self.labels
 
         # Re-orienting the scale for substantive interpretation:
-        if self.country=='USA' and self.method!='guided':
-            if Z[Z.party_label=='Dem 2015'].dim1.values[0] > Z[Z.party_label=='Rep 2015'].dim1.values[0]:
+        if self.method!='guided':
+            if reverse_scale(Z.dim1.values, self.labels, self.country, dimension=1):
                 Z['dim1'] = Z.dim1 * (-1)
                 self.reverse_dim1 = True
-            if Z[Z.party_label=='Dem 2015'].dim2.values[0] < Z[Z.party_label=='Rep 2015'].dim2.values[0]:
+            if reverse_scale(Z.dim2.values, self.labels, self.country, dimension=2):
                 Z['dim2'] = Z.dim2 * (-1)
                 self.reverse_dim2 = True
-        if self.country=='Canada' and self.method!='guided':
-            if Z[Z.party_label=='NDP 2015'].dim1.values[0] > Z[Z.party_label=='Cons 2015'].dim1.values[0]:
-                Z['dim1'] = Z.dim1 * (-1)
-                self.reverse_dim1 = True
-        if self.country=='UK' and self.method!='guided':
-            if Z[Z.party_label=='Labour 2010'].dim1.values[0] > Z[Z.party_label=='Cons 2010'].dim1.values[0]:
-                Z['dim1'] = Z.dim1 * (-1)
-                self.reverse_dim1 = True
         return Z
 
+    def rolling_placement(self, window=10, step=1):
+
+        # Placement refitted on sliding windows of consecutive sessions, with the axes of
+        # each window oriented like those of the previous window.
+        if self.method=='guided':
+            raise ValueError("The guided method has fixed axes; rolling placement requires a PCA method.")
+        z = np.array([self.model.docvecs[p] for p in self.parties])
+        return rolling_placement(z, self.parties, self.labels, self.country, window=window, step=step, n_components=self.components)
+
     def plot(self, axisnames=None, savepath=None, xlim=None):
 
         import matplotlib as mpl
@@ -97,9 +136,9 @@ class Explore(object):
         mpl.rcParams['font.size'] = 14
 
         plt.figure(figsize=(22,15))
-        plt.scatter(self.placement.dim1, self.placement.dim2, color=self.cols)
+        plt.scatter(self._placement.dim1, self._placement.dim2, color=self.cols)
         texts=[]
-        for label, x, y, c in zip(self.labels, self.placement.dim1, self.placement.dim2, self.cols):
+        for label, x, y, c in zip(self.labels, self._placement.dim1, self._placement.dim2, self.cols):
             plt.annotate(
                 label,
                 xy=(x, y), xytext=(-20, 20),
@@ -129,11 +168,7 @@ class Explore(object):
         mpl.rcParams['axes.labelsize'] = 20
         mpl.rcParams['font.size'] = 14
 
-        reshaped = self.placement
-        newvars = self.placement.party_label.str.split(n=1,expand=True)
-        reshaped['year'] = newvars[1].astype(float)
-        reshaped['party'] = self.fullnames
-        reshaped['color'] = self.cols
+        reshaped = self._placement.copy()
         fig, ax = plt.subplots(figsize=(22,15), sharex='all')
 
         for key, grp in reshaped.groupby('party'):
@@ -155,22 +190,172 @@ class Explore(object):
             plt.savefig(savepath, dpi=600, bbox_inches='tight')
         plt.show()
 
-    def interpret(self, top_words=20, min_count=100, max_count = 1000000, max_features=1000000):
-        Interpret(self.model, self.parties, self.dr, self.placement, self.labels, \
-                 min_count=min_count, max_count = max_count, rev1 = self.reverse_dim1, rev2 = self.reverse_dim2, \
-                 max_features = max_features).top_words_list(top_words)
+    def interpreter(self, min_count=100, max_count = 1000000, max_features=1000000):
+        key = (min_count, max_count, max_features)
+        if key not in self._interpreters:
+            interp = Interpret(self.model, self.parties, self.dr, self.placement, self.labels, \
+                min_count=min_count, max_count = max_count, rev1 = self.reverse_dim1, rev2 = self.reverse_dim2, \
+                max_features = max_features)
+            self._interpreters.setdefault(key, interp)
+        return self._interpreters[key]
+
+    def interpret(self, top_words=20, min_count=100, max_count = 1000000, max_features=1000000, verbose=True):
+        interp = self.interpreter(min_count=min_count, max_count=max_count, max_features=max_features)
+        if verbose:
+            interp.top_words_list(top_words)
+        return interp.top_words(top_words)
+
+    def similarity_matrix(self, metric='cosine', tags=None, out=None, block_size=2000):
+        # Party-session x party-session matrix; in-memory results are cached for this model.
+        if out:
+            return party_similarity(self.model, self.country, metric=metric, tags=tags, block_size=block_size, out=out)
+        key = (metric, tuple(tags) if tags else None)
+        if key not in self._similarity:
+            self._similarity.setdefault(key, party_similarity(self.model, self.country, metric=metric, tags=tags, block_size=block_size))
+        return self._similarity[key].copy()
+
+    def word_index(self, min_count=100):
+        if min_count not in self._word_index:
+            self._word_index.setdefault(min_count, WordIndex(self.model, min_count=min_count))
+        return self._word_index[min_count]
+
+    def party_words(self, party_tag, topn=20, min_count=100):
+        # Words closest to one or several party-session vectors in the full embedding space.
+        tags = [party_tag] if type(party_tag)==str else list(party_tag)
+        X = np.array([self.model.docvecs[t] for t in tags])
+        res = self.word_index(min_count).nearest(X, topn=topn)
+        if type(party_tag)==str:
+            return res[0]
+        return dict(zip(tags, res))
 
     def polarization(self):
         return polarization_metric(self.model, self.country)
 
+    def full_model(self):
+        if type(self.model)==PartyVectors:
+            # Loaded once, with its normalized vectors, even if several queries need it at once.
+            with self._full_model_lock:
+                model = self.model.full_model()
+                model.wv.init_sims()
+            return model
+        return self.model
+
+    def model_for(self, lexicon=None):
+        # Lexicon words missing from an artifact would be dropped silently, changing the
+        # axes, so such lexicons are read from the full model.
+        if type(self.model)!=PartyVectors or not lexicon:
+            return self.model
+        words = [lexicon] if type(lexicon)==str else [w for side in lexicon for w in side]
+        if all(w in self.model.wv.vocab for w in words):
+            return self.model
+        return self.full_model()
+
     def issue(self, topic_word, lex_size=50):
-        return issue_ownership(self.model, topic_word=topic_word, infer_vector=True, t_size=lex_size, country=self.country)
+        # The topic lexicon is drawn from the neighbours of the topic word in the whole
+        # vocabulary, which an artifact does not hold.
+        model = self.full_model()
+        return issue_ownership(model, topic_word=topic_word, infer_vector=True, t_size=lex_size, country=self.country)
 
-    def validate(self, custom_lexicon=None):
+    def validate(self, custom_lexicon=None, verbose=True):
+        model = self.model_for(custom_lexicon)
         if self.chamber:
-            Validate(self.model, self.country, chamber=self.chamber, method=self.method, custom_lexicon=custom_lexicon).print_accuracy()
+            v = Validate(model, self.country, chamber=self.chamber, method=self.method, custom_lexicon=custom_lexicon, batch_size=self.batch_size)
+        else:
+            v = Validate(model, self.country, method=self.method, custom_lexicon=custom_lexicon, batch_size=self.batch_size)
+        if verbose:
+            v.print_accuracy()
+        return v
+
+    def executor(self):
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    # Thread-pool variants, returning futures. Printing is disabled to keep outputs separate.
+    def submit_issue(self, topic_word, lex_size=50):
+        return self.executor().submit(self.issue, topic_word, lex_size)
+
+    def submit_polarization(self):
+        return self.executor().submit(self.polarization)
+
+    def submit_interpret(self, top_words=20, min_count=100, max_count = 1000000, max_features=1000000):
+        return self.executor().submit(self.interpret, top_words, min_count, max_count, max_features, False)
+
+    def submit_validate(self, custom_lexicon=None):
+        return self.executor().submit(self.validate, custom_lexicon, False)
+
+    # Coroutine variants, for use within an asyncio event loop.
+    async def issue_async(self, topic_word, lex_size=50):
+        return await asyncio.wrap_future(self.submit_issue(topic_word, lex_size))
+
+    async def polarization_async(self):
+        return await asyncio.wrap_future(self.submit_polarization())
+
+    async def interpret_async(self, top_words=20, min_count=100, max_count = 1000000, max_features=1000000):
+        return await asyncio.wrap_future(self.submit_interpret(top_words, min_count, max_count, max_features))
+
+    async def validate_async(self, custom_lexicon=None):
+        return await asyncio.wrap_future(self.submit_validate(custom_lexicon))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def axis(self, dimension=1):
+        # Direction in the embedding space corresponding to a placement dimension.
+        if self.method=='guided':
+            vec = lexicon_axes_2D(self.model_for(self.custom_lexicon), custom_lexicon=self.custom_lexicon)[dimension-1]
         else:
-            Validate(self.model, self.country, method=self.method, custom_lexicon=custom_lexicon).print_accuracy()
+            vec = self.dr.components_[dimension-1]
+            if (dimension==1 and self.reverse_dim1) or (dimension==2 and self.reverse_dim2):
+                vec = vec * (-1)
+        return vec
+
+    def project(self, X):
+        # Places arbitrary vectors on the same two dimensions as the party placement.
+        X = np.asarray(X).reshape(-1, self.M)
+        if self.method=='guided':
+            vecX, vecY = lexicon_axes_2D(self.model_for(self.custom_lexicon), custom_lexicon=self.custom_lexicon)
+            return np.column_stack((X.dot(vecX), X.dot(vecY)))
+        Z = self.dr.transform(X)[:, 0:2]
+        if self.reverse_dim1:
+            Z[:,0] = Z[:,0] * (-1)
+        if self.reverse_dim2:
+            Z[:,1] = Z[:,1] * (-1)
+        return Z
+
+    def place(self, vectors):
+        # Placement of party vectors from another source (e.g. a SpeechAggregate) on the fitted axes.
+        if hasattr(vectors, 'vectors'):
+            vectors = vectors.vectors()
+        tags = [t for t in self.parties if t in vectors]
+        Z = pd.DataFrame(self.project(np.array([vectors[t] for t in tags])), columns=['dim1', 'dim2'])
+        Z['party_label'] = [self.label_dict[t] for t in tags]
+        return Z
+
+    def compare_placements(self, vectors):
+        # Correlation between the doctag placement and the placement of the alternative vectors.
+        Z = self._placement[['party_label', 'dim1', 'dim2']].merge(self.place(vectors), on='party_label', suffixes=('_doctag', '_other'))
+        return Z, {'dim1': Z.dim1_doctag.corr(Z.dim1_other), 'dim2': Z.dim2_doctag.corr(Z.dim2_other)}
+
+    def word_scores(self, min_count=0, chunk_size=10000):
+        return word_scores(self.model, self.project, min_count=min_count, chunk_size=chunk_size)
+
+    def export_words(self, path, format='csv', min_count=0, chunk_size=10000):
+        export_word_scores(self.model, self.project, path, format=format, min_count=min_count, chunk_size=chunk_size)
+
+    def nearest_speeches(self, store, party=None, word=None, dimension=None, pole='right', topn=10):
+        if type(store)==str:
+            store = SpeechStore(store)
+        if dimension:
+            axis = self.axis(dimension)
+            if pole in ('left', 'down'):
+                axis = axis * (-1)
+            return store.nearest(self.model, axis=axis, topn=topn)
+        return store.nearest(self.model_for(word), party=party, word=word, topn=topn)
 
     def benchmarks(self, test='analogies'):
-        Validate(self.model, self.country, self.method).benchmarks(test=test)
+        Validate(self.full_model(), self.country, self.method, boot=False).benchmarks(test=test)
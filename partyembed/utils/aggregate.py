@@ -0,0 +1,95 @@
+#!/usr/bin/python3
+
+import numpy as np
+from multiprocessing import Pool
+from partyembed.utils.speeches import _init_worker, _infer_chunk
+
+def npz_path(path):
+    # np.savez appends the extension when it is missing; load needs the same file name.
+    return path if path.endswith('.npz') else path + '.npz'
+
+class SpeechAggregate(object):
+
+    # Running weighted sums of speech vectors by party-session tag. Aggregates computed on
+    # separate shards combine by addition, and new speeches can be added at any time.
+    def __init__(self, vector_size=200):
+        self.M = vector_size
+        self.tags = []
+        self.index = {}
+        self.sums = np.zeros((0, vector_size))
+        self.weights = np.zeros(0)
+
+    def _rows(self, tags):
+        new = [t for t in dict.fromkeys(tags) if t not in self.index]
+        if new:
+            for t in new:
+                self.index[t] = len(self.tags)
+                self.tags.append(t)
+            self.sums = np.vstack((self.sums, np.zeros((len(new), self.M))))
+            self.weights = np.concatenate((self.weights, np.zeros(len(new))))
+        return np.array([self.index[t] for t in tags], dtype=np.int64)
+
+    def add(self, tags, vectors, weights=None):
+        vectors = np.asarray(vectors, dtype=np.float64).reshape(-1, self.M)
+        weights = np.ones(len(vectors)) if weights is None else np.asarray(weights, dtype=np.float64)
+        rows = self._rows(list(tags))
+        np.add.at(self.sums, rows, vectors * weights.reshape(-1,1))
+        np.add.at(self.weights, rows, weights)
+        return self
+
+    def combine(self, other):
+        # Sums are already weighted, so they are added as they are.
+        rows = self._rows(other.tags)
+        self.sums[rows] += other.sums
+        self.weights[rows] += other.weights
+        return self
+
+    def vectors(self):
+        means = self.sums / np.maximum(self.weights, 1e-12).reshape(-1,1)
+        return {t: means[i] for i, t in enumerate(self.tags)}
+
+    def save(self, path):
+        np.savez(npz_path(path), tags=np.array(self.tags), sums=self.sums, weights=self.weights)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(npz_path(path))
+        agg = cls(data['sums'].shape[1])
+        agg.tags = [str(t) for t in data['tags']]
+        agg.index = {t: i for i, t in enumerate(agg.tags)}
+        agg.sums = data['sums']
+        agg.weights = data['weights']
+        return agg
+
+def _aggregate_chunk(args):
+    tags, chunk, epochs, weighting = args
+    Z = _infer_chunk((chunk, epochs))
+    weights = np.array([len(c) for c in chunk], dtype=np.float64) if weighting=='tokens' else None
+    return SpeechAggregate(Z.shape[1]).add(tags, Z, weights)
+
+def _shards(speeches, chunksize, epochs, weighting):
+    tags, chunk = [], []
+    for tag, tokens in speeches:
+        tags.append(tag)
+        chunk.append(tokens)
+        if len(chunk)==chunksize:
+            yield (tags, chunk, epochs, weighting)
+            tags, chunk = [], []
+    if chunk:
+        yield (tags, chunk, epochs, weighting)
+
+def aggregate_speeches(model_path, speeches, aggregate=None, workers=8, chunksize=1000, epochs=None, weighting='tokens'):
+
+    # speeches: iterable of (partytag, tokens); weighting is 'tokens' (speech length) or 'speeches'.
+    shards = _shards(speeches, chunksize, epochs, weighting)
+    with Pool(processes=workers, initializer=_init_worker, initargs=(model_path,)) as pool:
+        while True:
+            # A few shards per worker at a time keeps memory bounded; partial sums commute.
+            wave = [s for _, s in zip(range(2*workers), shards)]
+            if not wave:
+                break
+            for partial in pool.map(_aggregate_chunk, wave):
+                if aggregate is None:
+                    aggregate = SpeechAggregate(partial.M)
+                aggregate.combine(partial)
+    return aggregate
@@ -0,0 +1,115 @@
+#!/usr/bin/python3
+
+import os
+import numpy as np
+import pandas as pd
+from sklearn.utils.extmath import randomized_svd
+
+# Alignment matrices already computed in this session, by model pair.
+_ALIGNMENT_CACHE = {}
+
+def shared_vocab(source, target, n_words=20000):
+    # Most frequent words in the source model that are also in the target model.
+    wordlist = sorted(source.wv.vocab.items(), key=lambda kv: kv[1].count, reverse=True)
+    shared = []
+    for word, _ in wordlist:
+        if word in target.wv.vocab:
+            shared.append(word)
+            if len(shared)==n_words:
+                break
+    return shared
+
+def normalized_matrix(model, words):
+    X = np.zeros((len(words), model.vector_size), dtype=np.float32)
+    for i, w in enumerate(words):
+        X[i,:] = model.wv[w]
+    X /= np.linalg.norm(X, axis=1).reshape(-1,1)
+    return X
+
+def procrustes(A, B, block_size=50000, random_state=0):
+    # Orthogonal W minimizing ||AW - B||. The cross-covariance is accumulated in blocks,
+    # so the cost is linear in the number of anchor words and the SVD is only M x M.
+    M = A.shape[1]
+    C = np.zeros((M, M))
+    for start in range(0, A.shape[0], block_size):
+        C += A[start:start+block_size].T.dot(B[start:start+block_size])
+    U, _, Vt = randomized_svd(C, n_components=M, random_state=random_state)
+    return U.dot(Vt)
+
+class Alignment(object):
+
+    def __init__(self, source, target, source_name=None, target_name=None, n_words=20000, cache_dir=None):
+
+        self.source = source
+        self.target = target
+        self.source_name = source_name
+        self.target_name = target_name
+        self.words = shared_vocab(source, target, n_words=n_words)
+        self.V = len(self.words)
+        self.A = normalized_matrix(source, self.words)
+        self.B = normalized_matrix(target, self.words)
+        self.W = self.alignment_matrix(n_words, cache_dir)
+        self.A = self.A.dot(self.W)
+
+    def alignment_matrix(self, n_words, cache_dir=None):
+
+        # Only named models are cached: object ids are reused after garbage collection, so
+        # they cannot tell a new pair of models from an old one.
+        if self.source_name is None or self.target_name is None:
+            return procrustes(self.A, self.B)
+        key = (self.source_name, self.target_name, n_words)
+        if key in _ALIGNMENT_CACHE:
+            return _ALIGNMENT_CACHE[key]
+        path = None
+        if cache_dir:
+            path = os.path.join(cache_dir, 'align_%s_%s_%d.npy' % key)
+            if os.path.exists(path):
+                _ALIGNMENT_CACHE[key] = np.load(path)
+                return _ALIGNMENT_CACHE[key]
+        W = procrustes(self.A, self.B)
+        _ALIGNMENT_CACHE[key] = W
+        if path:
+            os.makedirs(cache_dir, exist_ok=True)
+            np.save(path, W)
+        return W
+
+    def transform(self, vectors):
+        return np.asarray(vectors).dot(self.W)
+
+    def doc_distance(self, tags, target_tags=None):
+
+        # Cosine distance between aligned source doctags and target doctags, e.g. D_110 across chambers.
+        if target_tags is None:
+            target_tags = tags
+        X = self.transform(np.array([self.source.docvecs[t] for t in tags]))
+        Y = np.array([self.target.docvecs[t] for t in target_tags])
+        X /= np.linalg.norm(X, axis=1).reshape(-1,1)
+        Y /= np.linalg.norm(Y, axis=1).reshape(-1,1)
+        return pd.DataFrame({'source': tags, 'target': target_tags,
+                             'cosine_distance': 1 - (X*Y).sum(axis=1)})
+
+    def word_shift(self):
+
+        # Cosine distance between each aligned source word and its target counterpart.
+        res = pd.DataFrame({'word': self.words, 'cosine_distance': 1 - (self.A*self.B).sum(axis=1)})
+        return res.sort_values(by='cosine_distance', ascending=False).reset_index(drop=True)
+
+    def neighbourhood_shift(self, topn=10, block_size=2000):
+
+        # Share of each word's nearest neighbours that differ between the two models.
+        overlap = np.zeros(self.V)
+        for start in range(0, self.V, block_size):
+            stop = min(start + block_size, self.V)
+            rows = np.arange(stop - start)
+            S1 = self.A[start:stop].dot(self.A.T)
+            S2 = self.B[start:stop].dot(self.B.T)
+            S1[rows, rows + start] = -np.inf
+            S2[rows, rows + start] = -np.inf
+            N1 = np.argpartition(-S1, topn, axis=1)[:,:topn]
+            N2 = np.argpartition(-S2, topn, axis=1)[:,:topn]
+            # Offsetting indices by row makes membership testable in one flat pass over the block.
+            offsets = (rows * self.V).reshape(-1,1)
+            common = np.isin((N1 + offsets).ravel(), (N2 + offsets).ravel()).reshape(N1.shape)
+            overlap[start:stop] = common.sum(axis=1) / topn
+        res = pd.DataFrame({'word': self.words, 'neighbour_change': 1 - overlap})
+        return res.sort_values(by='neighbour_change', ascending=False).reset_index(drop=True)
@@ -0,0 +1,108 @@
+#!/usr/bin/python3
+
+import os
+import json
+import numpy as np
+from gensim.models.doc2vec import Doc2Vec
+from partyembed.utils.guided import BASE_LEXICON
+
+META_FILE = 'meta.json'
+
+class SlimVocab(object):
+
+    def __init__(self, index, count):
+        self.index = index
+        self.count = count
+
+class SlimKeyedVectors(object):
+
+    # The subset of gensim's KeyedVectors interface used by partyembed.
+    def __init__(self, words, vectors, counts):
+        self.index2word = words
+        self.vectors = vectors
+        self.vocab = {w: SlimVocab(i, int(c)) for i, (w, c) in enumerate(zip(words, counts))}
+        self.vectors_norm = None
+
+    def __getitem__(self, word):
+        return self.vectors[self.vocab[word].index]
+
+    def __contains__(self, word):
+        return word in self.vocab
+
+    def init_sims(self):
+        if self.vectors_norm is None:
+            norms = np.linalg.norm(self.vectors, axis=1).reshape(-1,1)
+            self.vectors_norm = (self.vectors / np.maximum(norms, 1e-12)).astype(np.float32)
+
+    def most_similar(self, positive, topn=10):
+        self.init_sims()
+        if isinstance(positive, str):
+            exclude = {self.vocab[positive].index}
+            vec = self.vectors_norm[self.vocab[positive].index]
+        else:
+            exclude = set()
+            vec = np.asarray(positive) / np.linalg.norm(positive)
+        sims = self.vectors_norm.dot(vec)
+        best = np.argsort(-sims)[:topn + len(exclude)]
+        return [(self.index2word[i], float(sims[i])) for i in best if i not in exclude][:topn]
+
+class SlimDocvecs(object):
+
+    def __init__(self, doctags, vectors):
+        self.offset2doctag = doctags
+        self.vectors_docs = vectors
+        self.doctags = {t: i for i, t in enumerate(doctags)}
+
+    def __getitem__(self, tag):
+        return self.vectors_docs[self.doctags[tag]]
+
+    def __contains__(self, tag):
+        return tag in self.doctags
+
+class PartyVectors(object):
+
+    def __init__(self, path, mmap_mode='r'):
+
+        with open(os.path.join(path, META_FILE), 'r') as f:
+            self.meta = json.load(f)
+        with open(os.path.join(path, 'words.txt'), encoding='utf-8') as f:
+            words = [w.rstrip('\n') for w in f]
+        self.path = path
+        self.country = self.meta['country']
+        self.chamber = self.meta['chamber']
+        self.model_path = self.meta['model_path']
+        self.vector_size = self.meta['vector_size']
+        self.wv = SlimKeyedVectors(words, np.load(os.path.join(path, 'wordvecs.npy'), mmap_mode=mmap_mode),
+                                   np.load(os.path.join(path, 'counts.npy')))
+        self.docvecs = SlimDocvecs(self.meta['doctags'], np.load(os.path.join(path, 'docvecs.npy'), mmap_mode=mmap_mode))
+        self._full_model = None
+
+    def full_model(self):
+        # Loaded only for calls that need words or weights missing from the artifact.
+        if self._full_model is None:
+            if not self.model_path:
+                raise ValueError("This artifact was exported without a path to the full model.")
+            self._full_model = Doc2Vec.load(self.model_path)
+        return self._full_model
+
+def is_artifact(path):
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, META_FILE))
+
+def export_artifact(model, path, country='USA', chamber=None, n_words=5000, model_path=None):
+
+    os.makedirs(path, exist_ok=True)
+    lexicon = set(w for words in BASE_LEXICON for w in words)
+    wordlist = sorted(model.wv.vocab.items(), key=lambda kv: kv[1].count, reverse=True)
+    words = [w for w, _ in wordlist[0:n_words]]
+    words += sorted(w for w in lexicon if w in model.wv.vocab and w not in set(words))
+    np.save(os.path.join(path, 'wordvecs.npy'), np.array([model.wv[w] for w in words], dtype=np.float32))
+    np.save(os.path.join(path, 'counts.npy'), np.array([model.wv.vocab[w].count for w in words], dtype=np.int64))
+    with open(os.path.join(path, 'words.txt'), 'w', encoding='utf-8') as out_:
+        for w in words:
+            out_.write(w + '\n')
+    doctags = list(model.docvecs.offset2doctag)
+    np.save(os.path.join(path, 'docvecs.npy'), np.array([model.docvecs[t] for t in doctags], dtype=np.float32))
+    meta = {'country': country, 'chamber': chamber, 'vector_size': model.vector_size,
+            'model_path': os.path.abspath(model_path) if model_path else None, 'doctags': doctags}
+    with open(os.path.join(path, META_FILE), 'w') as out_:
+        json.dump(meta, out_)
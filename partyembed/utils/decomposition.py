@@ -0,0 +1,37 @@
+#!/usr/bin/python3
+
+from sklearn.decomposition import PCA, IncrementalPCA
+
+PCA_METHODS = ['pca', 'pca_randomized', 'pca_incremental']
+
+# Reference parties used to orient the scales: the first one should be on the left.
+REFERENCE_PARTIES = {'USA': ('Dem 2015', 'Rep 2015'),
+                     'Canada': ('NDP 2015', 'Cons 2015'),
+                     'UK': ('Labour 2010', 'Cons 2010')}
+
+def pca_backend(method='pca', n_components=2, batch_size=None, random_state=0):
+
+    if method=='pca':
+        return PCA(n_components=n_components)
+    elif method=='pca_randomized':
+        return PCA(n_components=n_components, svd_solver='randomized', random_state=random_state)
+    elif method=='pca_incremental':
+        return IncrementalPCA(n_components=n_components, batch_size=batch_size)
+    else:
+        raise ValueError("Method must be one of %s." % ', '.join(PCA_METHODS))
+
+def reverse_scale(scores, labels, country, dimension=1):
+
+    # True if the scale must be flipped so that the left reference party has the lower score
+    # on the first dimension (or, for the USA, the higher score on the second dimension).
+    left, right = REFERENCE_PARTIES.get(country, REFERENCE_PARTIES['UK'])
+    labels = list(labels)
+    if left not in labels or right not in labels:
+        return False
+    l = scores[labels.index(left)]
+    r = scores[labels.index(right)]
+    if dimension==1:
+        return l > r
+    elif country=='USA':
+        return l < r
+    return False
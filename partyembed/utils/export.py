@@ -0,0 +1,55 @@
+#!/usr/bin/python3
+
+import csv
+import numpy as np
+from numpy.lib.format import open_memmap
+
+def vocab_counts(model):
+    return np.array([model.wv.vocab[w].count for w in model.wv.index2word], dtype=np.int64)
+
+def word_scores(model, transform, min_count=0, chunk_size=10000):
+
+    # Streams (word, count, dim1, dim2) records; only one chunk of vectors is projected at a time.
+    words = model.wv.index2word
+    counts = vocab_counts(model)
+    for start in range(0, len(words), chunk_size):
+        stop = min(start + chunk_size, len(words))
+        keep = np.where(counts[start:stop] >= min_count)[0]
+        if len(keep)==0:
+            continue
+        Z = transform(model.wv.vectors[start:stop][keep])
+        for i, (d1, d2) in zip(keep, Z[:, 0:2]):
+            yield (words[start+i], int(counts[start+i]), float(d1), float(d2))
+
+def export_word_scores(model, transform, path, format='csv', min_count=0, chunk_size=10000):
+
+    if format=='csv':
+        with open(path, 'w', encoding='utf-8', newline='') as out_:
+            writer = csv.writer(out_)
+            writer.writerow(['word', 'count', 'dim1', 'dim2'])
+            for record in word_scores(model, transform, min_count=min_count, chunk_size=chunk_size):
+                writer.writerow(record)
+    elif format=='npy':
+        # Three aligned files: scores and counts as .npy arrays, words one per line.
+        counts = vocab_counts(model)
+        V = int((counts >= min_count).sum())
+        scores = open_memmap(path + '_scores.npy', mode='w+', dtype=np.float32, shape=(V, 2))
+        counts_out = open_memmap(path + '_counts.npy', mode='w+', dtype=np.int64, shape=(V,))
+        with open(path + '_words.txt', 'w', encoding='utf-8') as out_:
+            for i, (w, c, d1, d2) in enumerate(word_scores(model, transform, min_count=min_count, chunk_size=chunk_size)):
+                out_.write(w + '\n')
+                counts_out[i] = c
+                scores[i,:] = (d1, d2)
+        scores.flush(); counts_out.flush()
+        del scores, counts_out
+    else:
+        raise ValueError("Format must be csv or npy.")
+
+def load_word_scores(path):
+
+    # Reads an export with format='npy' without loading the model or the arrays in memory.
+    with open(path + '_words.txt', encoding='utf-8') as f:
+        words = [w.rstrip('\n') for w in f]
+    counts = np.load(path + '_counts.npy', mmap_mode='r')
+    scores = np.load(path + '_scores.npy', mmap_mode='r')
+    return words, counts, scores
@@ -50,7 +50,7 @@ def custom_projection_1D(z, model, custom_lexicon=None):
     Z = np.array(projections) 
     return Z
 
-def custom_projection_2D(z, model, custom_lexicon=None):
+def lexicon_axes_2D(model, custom_lexicon=None):
     M = model.vector_size
     if custom_lexicon:
         lex = custom_lexicon
@@ -58,7 +58,12 @@ def custom_projection_2D(z, model, custom_lexicon=None):
             raise ValueError("The custom lexicon should be a list of lists, with four elements.")
     else:
         lex = BASE_LEXICON
-    xl, xr, yd, yu = [get_vector(model, words, M) for words in lex] 
-    projections = [linear_projection_2D(x, xl, xr, yd, yu) for x in z]
-    Z = np.array(projections) 
+    xl, xr, yd, yu = [get_vector(model, words, M) for words in lex]
+    vecX = xr.mean(axis=0) - xl.mean(axis=0)
+    vecY = yu.mean(axis=0) - yd.mean(axis=0)
+    return vecX, vecY
+
+def custom_projection_2D(z, model, custom_lexicon=None):
+    vecX, vecY = lexicon_axes_2D(model, custom_lexicon=custom_lexicon)
+    Z = np.column_stack((np.dot(z, vecX), np.dot(z, vecY)))
     return Z
@@ -24,6 +24,10 @@ class Interpret(object):
         self.sims = self.compute_sims()
         self.dim1 = rev1
         self.dim2 = rev2
+        # Word lists as attributes (e.g. top_positive_dim1), set once here for the default 20
+        # words so that printing never modifies a shared instance.
+        for key, words in self.top_words(20).items():
+            setattr(self, 'top_' + key, ', '.join([w.replace('_',' ') for w in words]))
         
     def sorted_vocab(self, min_count=100, max_count=10000, max_features=10000):
         wordlist=[]
@@ -32,11 +36,14 @@ class Interpret(object):
         wordlist = sorted(wordlist, key=lambda tup: tup[1], reverse=True)
         return [w for w,c in wordlist if c>min_count and c<max_count and w.count('_')<3][0:max_features]
     
-    def compute_sims(self):
+    def compute_sims(self, batch_size=10000):
 
+        # Projecting the vocabulary in batches rather than one word at a time.
         Z = np.zeros((self.V, 2))
-        for idx, w in enumerate(self.voc):
-            Z[idx, :] = self.pca.transform(self.model.wv[w].reshape(1,-1))
+        for start in range(0, self.V, batch_size):
+            words = self.voc[start:start+batch_size]
+            X = np.array([self.model.wv[w] for w in words])
+            Z[start:start+len(words), :] = self.pca.transform(X)[:, 0:2]
         sims_right = euclidean_distances(Z, np.array([self.max[0],0]).reshape(1, -1))
         sims_left = euclidean_distances(Z, np.array([self.min[0],0]).reshape(1, -1))
         sims_up = euclidean_distances(Z, np.array([0,self.max[1]]).reshape(1, -1))
@@ -44,43 +51,27 @@ class Interpret(object):
         temp = pd.DataFrame({'word': self.voc, 'right': sims_right[:,0], 'left': sims_left[:,0], 'up': sims_up[:,0], 'down': sims_down[:,0]})
         return temp
 
-    def top_words_list(self, topn=20):
+    def top_words(self, topn=20):
 
-        if self.dim1:
-            ordering = ['left','right']
-        else:
-            ordering = ['right', 'left']
-        temp = self.sims.sort_values(by=ordering[0])
-        print(80*"-")
-        print("Words Associated with Positive Values (Right) on First Component:")
-        print(80*"-")
-        self.top_positive_dim1 = temp.word.tolist()[0:topn]
-        self.top_positive_dim1 = ', '.join([w.replace('_',' ') for w in self.top_positive_dim1])
-        print(self.top_positive_dim1)
-        temp = self.sims.sort_values(by=ordering[1])
-        print(80*"-")
-        print("Words Associated with Negative Values (Left) on First Component:")
-        print(80*"-")
-        self.top_negative_dim1 = temp.word.tolist()[0:topn]
-        self.top_negative_dim1 = ', '.join([w.replace('_',' ') for w in self.top_negative_dim1])
-        print(self.top_negative_dim1)
+        # Returns the word lists without modifying the object, so one instance can be shared across threads.
+        ordering1 = ['left','right'] if self.dim1 else ['right','left']
+        ordering2 = ['down','up'] if self.dim2 else ['up','down']
+        res = {}
+        for key, col in zip(['positive_dim1', 'negative_dim1', 'positive_dim2', 'negative_dim2'], ordering1 + ordering2):
+            res[key] = self.sims.nsmallest(topn, col).word.tolist()
+        return res
 
-        if self.dim2:
-            ordering = ['down','up']
-        else:
-            ordering = ['up', 'down']
-        temp = self.sims.sort_values(by=ordering[0])
-        print(80*"-")
-        print("Words Associated with Positive Values (North) on Second Component:")
-        print(80*"-")
-        self.top_positive_dim2 = temp.word.tolist()[0:topn]
-        self.top_positive_dim2 = ', '.join([w.replace('_',' ') for w in self.top_positive_dim2])
-        print(self.top_positive_dim2)
-        temp = self.sims.sort_values(by=ordering[1])
-        print(80*"-")
-        print("Words Associated with Negative Values (South) on Second Component:")
-        print(80*"-")
-        self.top_negative_dim2 = temp.word.tolist()[0:topn]
-        self.top_negative_dim2 = ', '.join([w.replace('_',' ') for w in self.top_negative_dim2])
-        print(self.top_negative_dim2)
+    def top_words_list(self, topn=20):
+
+        res = self.top_words(topn)
+        titles = {'positive_dim1': "Words Associated with Positive Values (Right) on First Component:",
+                  'negative_dim1': "Words Associated with Negative Values (Left) on First Component:",
+                  'positive_dim2': "Words Associated with Positive Values (North) on Second Component:",
+                  'negative_dim2': "Words Associated with Negative Values (South) on Second Component:"}
+        for key in ['positive_dim1', 'negative_dim1', 'positive_dim2', 'negative_dim2']:
+            words = ', '.join([w.replace('_',' ') for w in res[key]])
+            print(80*"-")
+            print(titles[key])
+            print(80*"-")
+            print(words)
         print(80*"-")
@@ -4,6 +4,13 @@ import numpy as np
 import pandas as pd
 from gensim.models.doc2vec import Doc2Vec
 from sklearn.metrics.pairwise import cosine_similarity, euclidean_distances
+from partyembed.utils.labels import party_labels
+
+# Parties reported for each country (column name, tag prefix).
+ISSUE_PARTIES = {'USA': [('dem', 'D_'), ('rep', 'R_')],
+                 'UK': [('lab', 'Lab_'), ('con', 'Con_'), ('lib', 'Lib_')],
+                 'Canada': [('lib', 'Liberal_'), ('con', 'Conservative_'), ('ndp', 'NDP_')]}
+
 
 def topic_vector(topicword, model, n = 20):
 
@@ -32,14 +39,12 @@ def bootstrap_topic_vector(topicword, model, n = 20, sims=1000):
 
 def cos_sim(parties, topic, boot=True, sims=1000):
 
+    # Returns an array of shape (3, P) with the mean and 95% bounds, or (1, P) without bootstrap.
+    C = cosine_similarity(parties, np.atleast_2d(topic))
     if boot:
-        P = parties.shape[0]
-        C = cosine_similarity(parties, topic)
-        m = np.mean(C, axis=1)
-        ci = np.percentile(C, q=[2.5, 97.5], axis=1)
-        return m.reshape(P,).tolist(), ci[0].reshape(P,).tolist(), ci[1].reshape(P,).tolist()
+        return np.vstack((C.mean(axis=1), np.percentile(C, q=[2.5, 97.5], axis=1)))
     else:
-        return cosine_similarity(parties, topic).reshape(P,).tolist()
+        return C.reshape(1, -1)
 
 
 def issue_ownership(model, topic_vector=None, topic_word=None, infer_vector=True, t_size = 20, boot=True, smooth=True, country='USA'):
@@ -58,112 +63,79 @@ def issue_ownership(model, topic_vector=None, topic_word=None, infer_vector=True
     res = fit(model, t, country=country, smooth=smooth, boot=boot)
     return res
 
-def fit(model, topic_vector, country='USA', smooth=True, boot=True):
+SESSION_NAMES = {'USA': 'congress', 'UK': 'parliament', 'Canada': 'parliament'}
 
-    M = model.vector_size
-    dv = model.docvecs.offset2doctag
-    if country=='USA':
-        parliaments = [i for i in range(43,115)]
-        years = [i for i in range(1873,2017,2)]
-        parties = [d for d in dv if d.startswith('D_') or d.startswith('R_')]
-        P = len(parties)
-        z = np.zeros(( P, M ))
-        for i in range(P):
-            z[i,:] = model.docvecs[parties[i]]
-        if boot:
-            C, LB, UB = cos_sim(z, topic_vector, boot=True, sims=1000)
-            res = pd.DataFrame({'congress': parliaments,
-                                'year': years,
-                                'dem': [s for t,s in zip(parties,C) if t.startswith('D_')],
-                                'dem_lb': [s for t,s in zip(parties,LB) if t.startswith('D_')],
-                                'dem_ub': [s for t,s in zip(parties,UB) if t.startswith('D_')],
-                                'rep': [s for t,s in zip(parties,C) if t.startswith('R_')],
-                                'rep_lb': [s for t,s in zip(parties,LB) if t.startswith('R_')],
-                                'rep_ub': [s for t,s in zip(parties,UB) if t.startswith('R_')]})
-        else:
-            C = cos_sim(z, topic_vector, boot=False)
-            res = pd.DataFrame({'congress': parliaments,
-                                'year': years,
-                                'dem': [s for t,s in zip(parties,C) if t.startswith('D_')],
-                                'rep': [s for t,s in zip(parties,C) if t.startswith('R_')]})
-        if smooth:
-            res = res.rolling(window=5,center=False).mean()
-            res['year'] = years
-            res['congress'] = parliaments
-        return res
-    elif country=='UK':
-        label_to_year = {37: '1935', 38: '1945', 39: '1950', 40: '1951', 41: '1955', 42: '1959', 43: '1964', 44: '1966',
-                       45: '1970', 46: '1974.1', 47: '1974.2', 48: '1979', 49: '1983', 50: '1987', 51: '1992', 52: '1997',
-                       53: '2001', 54: '2005', 55: '2010'}
-        parliaments = [i for i in range(37,56)]
-        years = [label_to_year[p] for p in parliaments]
-        parties = [d for d in dv if 'Lab_' in d or 'Con_' in d or 'Lib_' in d]
-        P = len(parties)
-        z = np.zeros(( P, M ))
-        for i in range(P):
-            z[i,:] = model.docvecs[parties[i]]
-        if boot:
-            C, LB, UB = cos_sim(z, topic_vector, boot=True, sims=1000)
-            res = pd.DataFrame({'parliament': parliaments,
-                                'year': years,
-                                'lab': [s for t,s in zip(parties,C) if 'Lab_' in t],
-                                'lab_lb': [s for t,s in zip(parties,LB) if 'Lab_' in t],
-                                'lab_ub': [s for t,s in zip(parties,UB) if 'Lab_' in t],
-                                'con': [s for t,s in zip(parties,C) if 'Con_' in t],
-                                'con_lb': [s for t,s in zip(parties,LB) if 'Con_' in t],
-                                'con_ub': [s for t,s in zip(parties,UB) if 'Con_' in t],
-                                'lib': [s for t,s in zip(parties,C) if 'Lib_' in t],
-                                'lib_lb': [s for t,s in zip(parties,LB) if 'Lib_' in t],
-                                'lib_ub': [s for t,s in zip(parties,UB) if 'Lib_' in t]})
-        else:
-            C = cos_sim(z, topic_vector, boot=False)
-            res = pd.DataFrame({'parliament': parliaments,
-                            'year': years,
-                            'lab': [s for t,s in zip(parties,C) if 'Lab_' in t],
-                            'con': [s for t,s in zip(parties,C) if 'Con_' in t],
-                            'lib': [s for t,s in zip(parties,C) if 'Lib_' in t]})
-        if smooth:
-            res = res.rolling(window=5,center=False).mean()
-            res['year'] = years
-            res['parliament'] = parliaments
-        return res
-    elif country=='Canada':
-        label_to_year = {9.0: '1901', 10.0: '1904', 11.0: '1908', 12.0: '1911', 13.0: '1918', 14.0: '1922', 15.1: '1925.1', 15.2: '1925.2',
-                        16.0: '1926', 17.0: '1930', 18.0: '1935', 19.0: '1940', 20.0: '1945', 21.0: '1949', 22.0: '1953', 23.0: '1957',
-                        24.0: '1958', 25.0: '1962', 26.0: '1963', 27.0: '1965', 28.0: '1968', 29.0: '1972', 30.0: '1974', 31.0: '1979',
-                        32.0: '1980', 33.0: '1984', 34.0: '1988', 35.0: '1993', 36.0: '1997', 37.0: '2000', 38.0: '2004', 39.0: '2006',
-                        40.0: '2008', 41.0: '2011', 42.0: '2015'}
-        parliaments = sorted(list(label_to_year.keys()))
-        years = [label_to_year[p] for p in parliaments]
-        parties = [d for d in dv if 'Liberal_' in d or 'Conservative_' in d or 'NDP_' in d]
-        P = len(parties)
-        z = np.zeros(( P, M ))
-        for i in range(P):
-            z[i,:] = model.docvecs[parties[i]]
-        if boot:
-            C, LB, UB = cos_sim(z, topic_vector, boot=True, sims=1000)
-            res = pd.DataFrame({'parliament': parliaments,
-                                'year': years,
-                                'lib': [s for t,s in zip(parties,C) if 'Liberal_' in t],
-                                'lib_lb': [s for t,s in zip(parties,LB) if 'Liberal_' in t],
-                                'lib_ub': [s for t,s in zip(parties,UB) if 'Liberal_' in t],
-                                'con': [s for t,s in zip(parties,C) if 'Conservative_' in t],
-                                'con_lb': [s for t,s in zip(parties,LB) if 'Conservative_' in t],
-                                'con_ub': [s for t,s in zip(parties,UB) if 'Conservative_' in t],
-                                'ndp': [np.nan]*10 + [s for t,s in zip(parties,C) if 'NDP_' in t],
-                                'ndp_lb': [np.nan]*10 + [s for t,s in zip(parties,LB) if 'NDP_' in t],
-                                'ndp_ub': [np.nan]*10 + [s for t,s in zip(parties,UB) if 'NDP_' in t]})
-        else:
-            C = cos_sim(z, topic_vector, boot=False)
-            res = pd.DataFrame({'parliament': parliaments,
-                            'year': years,
-                            'lab': [s for t,s in zip(parties,C) if 'Liberal_' in t],
-                            'con': [s for t,s in zip(parties,C) if 'Conservative_' in t],
-                            'ndp': [np.nan]*10 + [s for t,s in zip(parties,C) if 'NDP_' in t]})
-        if smooth:
-            res = res.rolling(window=5,center=False).mean()
-            res['year'] = years
-            res['parliament'] = parliaments
-        return res
-    else:
+def session_key(tag, prefix):
+    # Session number of a party-session tag, or None for other tags sharing the prefix
+    # (e.g. legislator tags such as 'D_114_PELOSI').
+    try:
+        return float(tag[len(prefix):])
+    except ValueError:
+        return None
+
+def issue_sessions(country):
+
+    # Sessions and years are read from the party-tag labels, e.g. 'D_43' -> 'Dem 1873'.
+    if country not in SESSION_NAMES:
         raise ValueError("Country must be 'USA', 'UK' or 'Canada'.")
+    label_to_year = {}
+    for tag, label in party_labels(country).items():
+        key = session_key(tag, tag.rsplit('_', 1)[0] + '_')
+        if key is not None:
+            label_to_year[key] = label.split(' ', 1)[1]
+    sessions = sorted(label_to_year.keys())
+    years = [label_to_year[k] for k in sessions]
+    # Integer sessions and years are reported as integers, as in the labels of each country.
+    if all(k.is_integer() for k in sessions):
+        sessions = [int(k) for k in sessions]
+    if all(y.isdigit() for y in years):
+        years = [int(y) for y in years]
+    return SESSION_NAMES[country], sessions, years
+
+def rolling_mean(A, window=5):
+
+    # Trailing mean over the last axis; like pandas rolling(window).mean(), a window
+    # containing a missing session is missing.
+    missing = np.isnan(A)
+    S = np.cumsum(np.where(missing, 0, A), axis=-1)
+    N = np.cumsum(missing, axis=-1)
+    S[..., window:] = S[..., window:] - S[..., :-window]
+    N[..., window:] = N[..., window:] - N[..., :-window]
+    R = S / window
+    R[(N > 0)] = np.nan
+    R[..., :window-1] = np.nan
+    return R
+
+def fit(model, topic_vector, country='USA', smooth=True, boot=True, parties=None):
+
+    # parties: list of (column name, tag prefix), defaults to the parties of the country.
+    parties = ISSUE_PARTIES.get(country) if parties is None else parties
+    session_name, sessions, years = issue_sessions(country)
+    session_index = {float(s): i for i, s in enumerate(sessions)}
+
+    # Party-session tags known to the model, with their row and column in the result array.
+    tags, rows, cols = [], [], []
+    for d in model.docvecs.offset2doctag:
+        for p, (_, prefix) in enumerate(parties):
+            if d.startswith(prefix):
+                key = session_key(d, prefix)
+                if key in session_index:
+                    tags.append(d)
+                    rows.append(p)
+                    cols.append(session_index[key])
+                break
+    z = np.array([model.docvecs[t] for t in tags])
+
+    # Scores are scattered into a (statistic x party x session) array; gaps stay missing.
+    stats = cos_sim(z, topic_vector, boot=boot, sims=1000)
+    A = np.full((stats.shape[0], len(parties), len(sessions)), np.nan)
+    A[:, rows, cols] = stats
+    if smooth:
+        A = rolling_mean(A, window=5)
+
+    res = pd.DataFrame({session_name: sessions, 'year': years}, columns=[session_name, 'year'])
+    suffixes = ['', '_lb', '_ub'] if boot else ['']
+    for p, (name, _) in enumerate(parties):
+        for k, suffix in enumerate(suffixes):
+            res[name + suffix] = A[k, p]
+    return res
@@ -0,0 +1,173 @@
+#!/usr/bin/python3
+
+import numpy as np
+import pandas as pd
+from partyembed.utils.labels import party_labels, party_tags
+from partyembed.utils.guided import BASE_LEXICON
+from partyembed.utils.decomposition import REFERENCE_PARTIES
+from partyembed.validate import DATA_PATH, Validate
+
+def pearson_columns(S, g):
+    # Correlation of each column of S with the vector g.
+    S = S - S.mean(axis=0)
+    g = g - g.mean()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r = g.dot(S) / np.sqrt((S*S).sum(axis=0) * g.dot(g))
+    return np.where(np.isnan(r), -1.0, r)
+
+class LexiconSearch(object):
+
+    def __init__(self, model, country='USA', chamber='House', reference=None, lexicon=None,
+                 n_candidates=5000, holdout=0.2, seed=1):
+
+        self.model = model
+        self.country = country
+        self.chamber = chamber
+        self.rng = np.random.RandomState(seed)
+        if reference is None:
+            reference = 'voteview' if country=='USA' else 'rile'
+        self.reference = reference
+        if lexicon is None:
+            lexicon = [BASE_LEXICON[0] + BASE_LEXICON[2], BASE_LEXICON[1] + BASE_LEXICON[3]]
+
+        # All party vectors, as in Validate; only those with a gold-standard score enter the objective.
+        label_dict = party_labels(country)
+        _, parties, _, _ = party_tags(model, country)
+        self.all_labels = [label_dict[p] for p in parties]
+        if country=='USA':
+            gold = pd.read_csv(DATA_PATH + 'goldstandard_' + chamber.lower() + '.csv')
+        else:
+            gold = pd.read_csv(DATA_PATH + 'goldstandard_' + country.lower() + '.csv')
+        gold = gold.drop_duplicates('label').set_index('label')[reference]
+        g = np.array([gold.get(l, np.nan) for l in self.all_labels], dtype=float)
+        self.gold_rows = np.where(~np.isnan(g))[0]
+        self.labels = [self.all_labels[i] for i in self.gold_rows]
+        self.g = g[self.gold_rows]
+        z = np.array([model.docvecs[p] for p in parties])
+
+        # Rows of the reference parties, which orient the scale exactly as in Validate (reverse_scale).
+        left, right = REFERENCE_PARTIES.get(country, REFERENCE_PARTIES['UK'])
+        self.ref_rows = None
+        if left in self.all_labels and right in self.all_labels:
+            self.ref_rows = np.array([self.all_labels.index(left), self.all_labels.index(right)])
+
+        # Holdout sessions: all parties of a held-out year are excluded from the search objective.
+        years = np.array([l.split(' ', 1)[1] for l in self.labels])
+        unique_years = np.unique(years)
+        held = self.rng.choice(unique_years, size=int(round(holdout * len(unique_years))), replace=False)
+        self.test = np.isin(years, held)
+        self.train = ~self.test
+
+        # Candidate words: the current lexicon plus the most frequent words.
+        wordlist = sorted(model.wv.vocab.items(), key=lambda kv: kv[1].count, reverse=True)
+        lex_words = [w for side in lexicon for w in side if w in model.wv.vocab]
+        frequent = [w for w, _ in wordlist[0:n_candidates] if w not in set(lex_words)]
+        self.words = list(dict.fromkeys(lex_words + frequent))
+        index = {w: i for i, w in enumerate(self.words)}
+        V = np.array([model.wv[w] for w in self.words])
+        # Projection of every party on every candidate word, computed once: (P x C).
+        self.ZV = z.dot(V.T)
+        self.C = len(self.words)
+        self.left = np.zeros(self.C, dtype=bool)
+        self.right = np.zeros(self.C, dtype=bool)
+        self.left[[index[w] for w in lexicon[0] if w in index]] = True
+        self.right[[index[w] for w in lexicon[1] if w in index]] = True
+        self.sum_left = self.ZV[:, self.left].sum(axis=1)
+        self.sum_right = self.ZV[:, self.right].sum(axis=1)
+
+    def orientation(self, S):
+        # -1 where the scale must be flipped (left reference party to the right), as reverse_scale;
+        # S holds the scores of all parties, one column per candidate lexicon.
+        if self.ref_rows is None:
+            return np.ones(S.shape[1])
+        return np.where(S[self.ref_rows[0]] > S[self.ref_rows[1]], -1.0, 1.0)
+
+    def scores(self):
+        S = (self.sum_right / self.right.sum() - self.sum_left / self.left.sum()).reshape(-1,1)
+        return (S * self.orientation(S))[:, 0]
+
+    def correlation(self, rows=None):
+        rows = self.train if rows is None else rows
+        return pearson_columns(self.scores()[self.gold_rows][rows].reshape(-1,1), self.g[rows])[0]
+
+    def candidate_moves(self, min_size=5):
+
+        # Train correlation after each possible single-word move, all candidates at once.
+        # Means are updated incrementally from running sums: adding word c to the right list
+        # changes its mean to (sum_right + ZV[:,c]) / (n_right + 1). Each candidate scale is
+        # oriented by the reference parties before correlating, as in Validate.
+        nl, nr = self.left.sum(), self.right.sum()
+        rows = self.gold_rows[self.train]
+        if self.ref_rows is not None:
+            rows = np.concatenate((rows, self.ref_rows))
+        n = self.train.sum()
+        ZV = self.ZV[rows]
+        sl, sr = self.sum_left[rows].reshape(-1,1), self.sum_right[rows].reshape(-1,1)
+        g = self.g[self.train]
+        def oriented(S):
+            sign = np.ones(S.shape[1]) if self.ref_rows is None else np.where(S[n] > S[n+1], -1.0, 1.0)
+            return pearson_columns(S[:n] * sign, g)
+        moves = {}
+        free = ~(self.left | self.right)
+        moves['add_right'] = np.where(free, oriented((sr + ZV)/(nr + 1) - sl/nl), -np.inf)
+        moves['add_left'] = np.where(free, oriented(sr/nr - (sl + ZV)/(nl + 1)), -np.inf)
+        if nr > min_size:
+            moves['drop_right'] = np.where(self.right, oriented((sr - ZV)/(nr - 1) - sl/nl), -np.inf)
+        if nl > min_size:
+            moves['drop_left'] = np.where(self.left, oriented(sr/nr - (sl - ZV)/(nl - 1)), -np.inf)
+        return moves
+
+    def apply(self, move, c):
+        if move=='add_right':
+            self.right[c] = True; self.sum_right += self.ZV[:, c]
+        elif move=='add_left':
+            self.left[c] = True; self.sum_left += self.ZV[:, c]
+        elif move=='drop_right':
+            self.right[c] = False; self.sum_right -= self.ZV[:, c]
+        elif move=='drop_left':
+            self.left[c] = False; self.sum_left -= self.ZV[:, c]
+
+    def search(self, method='greedy', max_iter=200, tol=1e-4, temperature=0.01, cooling=0.98, min_size=5):
+
+        # The search follows the train correlation; the lexicon kept at the end is the one with the
+        # best holdout correlation, which guards against overfitting the training sessions.
+        select = self.correlation if not self.test.any() else (lambda: self.correlation(self.test))
+        current = self.correlation()
+        history = [(0, None, None, current, select())]
+        best = (select(), self.left.copy(), self.right.copy(), self.sum_left.copy(), self.sum_right.copy())
+        for it in range(1, max_iter + 1):
+            moves = self.candidate_moves(min_size=min_size)
+            names = list(moves.keys())
+            R = np.array([moves[m] for m in names])
+            if method=='greedy':
+                m, c = np.unravel_index(np.argmax(R), R.shape)
+                if R[m, c] - current < tol:
+                    break
+            elif method=='stochastic':
+                # Simulated annealing over the full set of scored moves.
+                valid = np.where(np.isfinite(R.ravel()))[0]
+                weights = np.exp((R.ravel()[valid] - R.ravel()[valid].max()) / temperature)
+                m, c = np.unravel_index(self.rng.choice(valid, p=weights / weights.sum()), R.shape)
+                temperature *= cooling
+            else:
+                raise ValueError("Method must be greedy or stochastic.")
+            self.apply(names[m], c)
+            current = R[m, c]
+            history.append((it, names[m], self.words[c], current, select()))
+            if history[-1][4] > best[0]:
+                best = (history[-1][4], self.left.copy(), self.right.copy(), self.sum_left.copy(), self.sum_right.copy())
+        _, self.left, self.right, self.sum_left, self.sum_right = best
+        self.history = pd.DataFrame(history, columns=['iteration', 'move', 'word', 'train_correlation', 'holdout_correlation'])
+        self.check()
+        return self.lexicon()
+
+    def check(self):
+        # The search objective, on all gold-standard parties, must equal Validate's score for the lexicon.
+        v = Validate(self.model, self.country, method='guided', custom_lexicon=self.lexicon(), chamber=self.chamber, boot=False)
+        expected = dict(v.correlation)[self.reference]
+        score = self.correlation(np.ones(len(self.g), dtype=bool))
+        assert np.isclose(score, expected), "Search score %0.4f differs from Validate %0.4f" % (score, expected)
+        return score
+
+    def lexicon(self):
+        return [[w for w, k in zip(self.words, self.left) if k], [w for w, k in zip(self.words, self.right) if k]]
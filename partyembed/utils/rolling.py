@@ -0,0 +1,58 @@
+#!/usr/bin/python3
+
+import numpy as np
+import pandas as pd
+from partyembed.utils.decomposition import reverse_scale, REFERENCE_PARTIES
+
+def svd_components(X, n_components=2):
+    # Windows hold a few dozen party-sessions, so an exact SVD per window is cheaper than
+    # warm-started iterative solvers.
+    _, _, Vt = np.linalg.svd(X - X.mean(axis=0), full_matrices=False)
+    return Vt[0:n_components]
+
+def session_key(tag):
+    # Party tags end with the session number, e.g. 'D_114' or 'Liberal_15.1'.
+    return float(tag.rsplit('_', 1)[1])
+
+def rolling_placement(X, tags, labels, country, window=10, step=1, n_components=2):
+
+    # Each window is fitted by an exact SVD and oriented like the previous window.
+    sessions = np.array([session_key(t) for t in tags])
+    unique = np.unique(sessions)
+    labels = np.array(labels)
+    starts = range(0, max(len(unique) - window, 0) + 1, step)
+    cols = ['dim1', 'dim2'][0:n_components]
+    frames = []
+    components = None
+    for w, start in enumerate(starts):
+        rows = np.where(np.isin(sessions, unique[start:start+window]))[0]
+        comp = svd_components(X[rows], n_components=n_components)
+        # Each axis keeps the orientation of the same axis in the previous window.
+        if components is not None:
+            signs = np.where((comp * components).sum(axis=1) < 0, -1, 1)
+            comp = comp * signs.reshape(-1,1)
+        components = comp
+        Z = (X[rows] - X[rows].mean(axis=0)).dot(comp[0:len(cols)].T)
+        frame = pd.DataFrame(Z, columns=cols)
+        frame['party_label'] = labels[rows]
+        frame['window'] = w
+        frame['first_session'] = unique[start]
+        frame['last_session'] = unique[min(start + window, len(unique)) - 1]
+        frames.append(frame)
+    Z = pd.concat(frames, ignore_index=True)
+
+    # The windows form one sign-aligned chain, so the reference-party orientation is decided
+    # in the last window containing both reference parties and applied to the whole chain.
+    for d, col in enumerate(cols):
+        for frame in reversed(frames):
+            if reverse_scale(frame[col].values, frame.party_label, country, dimension=d+1):
+                Z[col] = Z[col] * (-1)
+                break
+            if _has_references(frame.party_label, country):
+                break
+    return Z
+
+def _has_references(labels, country):
+    left, right = REFERENCE_PARTIES.get(country, REFERENCE_PARTIES['UK'])
+    labels = set(labels)
+    return left in labels and right in labels
@@ -0,0 +1,77 @@
+#!/usr/bin/python3
+
+import numpy as np
+import pandas as pd
+from numpy.lib.format import open_memmap
+from partyembed.utils.labels import party_labels, party_tags
+
+def party_similarity(model, country='USA', metric='cosine', tags=None, block_size=2000, out=None):
+
+    # Similarity (cosine) or distance (euclidean) between every pair of party-session vectors.
+    # tags defaults to the parties of the country; any doctags (e.g. legislators) can be passed.
+    if tags is None:
+        _, tags, _, _ = party_tags(model, country)
+    label_dict = party_labels(country)
+    labels = [label_dict.get(t, t) for t in tags]
+    P = len(tags)
+    X = np.array([model.docvecs[t] for t in tags], dtype=np.float32)
+    norms = np.linalg.norm(X, axis=1)
+    if metric=='cosine':
+        X = X / norms.reshape(-1,1)
+    elif metric!='euclidean':
+        raise ValueError("Metric must be cosine or euclidean.")
+
+    if out:
+        # Written block by block to a memory-mapped .npy file, for matrices too large for RAM.
+        R = open_memmap(out + '.npy', mode='w+', dtype=np.float32, shape=(P, P))
+        with open(out + '_labels.txt', 'w', encoding='utf-8') as out_:
+            for l in labels:
+                out_.write(l + '\n')
+    else:
+        R = np.zeros((P, P), dtype=np.float32)
+    sq = norms**2
+    for start in range(0, P, block_size):
+        stop = min(start + block_size, P)
+        S = X[start:stop].dot(X.T)
+        if metric=='euclidean':
+            S = np.sqrt(np.maximum(sq[start:stop].reshape(-1,1) + sq.reshape(1,-1) - 2*S, 0))
+        R[start:stop] = S
+    if out:
+        R.flush()
+        return R, labels
+    return pd.DataFrame(R, index=labels, columns=labels)
+
+class WordIndex(object):
+
+    def __init__(self, model, min_count=100, block_size=50000):
+
+        # Unit-length float32 word vectors, restricted to words seen at least min_count times.
+        counts = np.array([model.wv.vocab[w].count for w in model.wv.index2word])
+        rows = np.where(counts >= min_count)[0]
+        self.words = [model.wv.index2word[i] for i in rows]
+        self.W = np.zeros((len(rows), model.vector_size), dtype=np.float32)
+        for start in range(0, len(rows), block_size):
+            block = np.asarray(model.wv.vectors[rows[start:start+block_size]], dtype=np.float32)
+            self.W[start:start+block_size] = block / np.maximum(np.linalg.norm(block, axis=1), 1e-12).reshape(-1,1)
+
+    def nearest(self, vectors, topn=20, block_size=50000):
+
+        # Top-k words by cosine similarity for each query row, one matrix product per vocabulary block.
+        Q = np.asarray(vectors, dtype=np.float32).reshape(-1, self.W.shape[1])
+        Q = Q / np.linalg.norm(Q, axis=1).reshape(-1,1)
+        K = len(Q)
+        best_scores = np.zeros((K, 0), dtype=np.float32)
+        best_rows = np.zeros((K, 0), dtype=np.int64)
+        for start in range(0, len(self.words), block_size):
+            S = Q.dot(self.W[start:start+block_size].T)
+            scores = np.concatenate((best_scores, S), axis=1)
+            rows = np.concatenate((best_rows, np.tile(np.arange(start, start + S.shape[1]), (K, 1))), axis=1)
+            if scores.shape[1] > topn:
+                idx = np.argpartition(-scores, topn, axis=1)[:, :topn]
+                scores = np.take_along_axis(scores, idx, axis=1)
+                rows = np.take_along_axis(rows, idx, axis=1)
+            best_scores, best_rows = scores, rows
+        order = np.argsort(-best_scores, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        return [[(self.words[r], float(s)) for r, s in zip(rr, ss)] for rr, ss in zip(best_rows, best_scores)]
@@ -0,0 +1,119 @@
+#!/usr/bin/python3
+
+import os
+import numpy as np
+import pandas as pd
+from multiprocessing import Pool
+from gensim.models.doc2vec import Doc2Vec
+
+VECTOR_FILE = 'vectors.f32'
+META_FILE = 'meta.csv'
+META_COLUMNS = ['speech_id', 'speaker', 'party', 'congress']
+
+_worker_model = None
+
+def _init_worker(model_path):
+    global _worker_model
+    # Memory-mapping the arrays lets all workers share one copy of the model.
+    _worker_model = Doc2Vec.load(model_path, mmap='r')
+
+def _infer_chunk(args):
+    chunk, epochs = args
+    Z = np.zeros((len(chunk), _worker_model.vector_size), dtype=np.float32)
+    for i, tokens in enumerate(chunk):
+        Z[i,:] = _worker_model.infer_vector(tokens, epochs=epochs)
+    return Z
+
+def _chunked(speeches, chunksize):
+    meta, chunk = [], []
+    for speech_id, speaker, party, congress, tokens in speeches:
+        meta.append((speech_id, speaker, party, congress))
+        chunk.append(tokens)
+        if len(chunk)==chunksize:
+            yield meta, chunk
+            meta, chunk = [], []
+    if chunk:
+        yield meta, chunk
+
+def build_speech_store(model_path, speeches, outpath, workers=8, chunksize=1000, epochs=None):
+
+    # speeches: iterable of (speech_id, speaker, party, congress, tokens) tuples.
+    os.makedirs(outpath, exist_ok=True)
+    n = 0
+    with open(os.path.join(outpath, VECTOR_FILE), 'wb') as vec_, \
+         open(os.path.join(outpath, META_FILE), 'w', encoding='utf-8') as meta_, \
+         Pool(processes=workers, initializer=_init_worker, initargs=(model_path,)) as pool:
+        meta_.write(','.join(META_COLUMNS) + '\n')
+        wave = []
+        # Chunks are dispatched in waves of a few per worker to keep memory bounded.
+        for item in _chunked(speeches, chunksize):
+            wave.append(item)
+            if len(wave) < 2*workers:
+                continue
+            n += _write_wave(pool, wave, epochs, vec_, meta_)
+            wave = []
+            print("Inferred %d speech vectors." %n)
+        if wave:
+            n += _write_wave(pool, wave, epochs, vec_, meta_)
+    return n
+
+def _write_wave(pool, wave, epochs, vec_, meta_):
+    n = 0
+    # map preserves input order, so rows of the matrix stay aligned with the metadata.
+    for (meta, _), Z in zip(wave, pool.map(_infer_chunk, [(chunk, epochs) for _, chunk in wave])):
+        vec_.write(Z.tobytes())
+        pd.DataFrame(meta).to_csv(meta_, header=False, index=False)
+        n += len(Z)
+    return n
+
+def _top_k(scores, offsets, k):
+    if len(scores) > k:
+        idx = np.argpartition(-scores, k)[:k]
+        return scores[idx], offsets[idx]
+    return scores, offsets
+
+class SpeechStore(object):
+
+    def __init__(self, path):
+
+        self.path = path
+        self.meta = pd.read_csv(os.path.join(path, META_FILE), dtype={'speech_id': str, 'speaker': str, 'party': str})
+        self.N = len(self.meta)
+        self.M = os.path.getsize(os.path.join(path, VECTOR_FILE)) // (4 * max(self.N, 1))
+        self.vectors = np.memmap(os.path.join(path, VECTOR_FILE), dtype=np.float32, mode='r', shape=(self.N, self.M))
+
+    def search(self, query, topn=10, metric='cosine', block_size=100000):
+
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        if metric=='cosine':
+            query = query / np.linalg.norm(query)
+        elif metric!='dot':
+            raise ValueError("Metric must be cosine or dot.")
+        best_scores = np.zeros(0, dtype=np.float32)
+        best_rows = np.zeros(0, dtype=np.int64)
+        # Only one block of the memory-mapped matrix is held in RAM at a time.
+        for start in range(0, self.N, block_size):
+            block = np.asarray(self.vectors[start:start + block_size])
+            scores = block.dot(query)
+            if metric=='cosine':
+                norms = np.linalg.norm(block, axis=1)
+                norms[norms==0] = 1.0
+                scores = scores / norms
+            rows = np.arange(start, start + len(block))
+            best_scores, best_rows = _top_k(np.concatenate((best_scores, scores)), np.concatenate((best_rows, rows)), topn)
+        order = np.argsort(-best_scores)
+        res = self.meta.iloc[best_rows[order]].copy()
+        res['score'] = best_scores[order]
+        return res.reset_index(drop=True)
+
+    def nearest(self, model, party=None, word=None, axis=None, topn=10, block_size=100000):
+
+        if party is not None:
+            return self.search(model.docvecs[party], topn=topn, metric='cosine', block_size=block_size)
+        elif word is not None:
+            return self.search(model.wv[word], topn=topn, metric='cosine', block_size=block_size)
+        elif axis is not None:
+            # Speeches with the largest projections on the axis.
+            return self.search(axis, topn=topn, metric='dot', block_size=block_size)
+        else:
+            raise ValueError("Provide a party tag, a word or a projection axis.")
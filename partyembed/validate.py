@@ -5,23 +5,24 @@ import numpy as np
 import pandas as pd
 import scipy as sp
 from sklearn import metrics
-from sklearn.decomposition import PCA
 from gensim.models.doc2vec import Doc2Vec
 from partyembed.utils.labels import party_labels, party_tags
 from partyembed.utils.guided import custom_projection_1D
+from partyembed.utils.decomposition import pca_backend, reverse_scale, PCA_METHODS
 
 DATA_PATH = pkg_resources.resource_filename('partyembed', 'data/')
 MODEL_PATH = pkg_resources.resource_filename('partyembed', 'models/')
 
 class Validate(object):
 
-    def __init__(self, model, country='USA', method='pca', custom_lexicon=None, chamber='House'):
+    def __init__(self, model, country='USA', method='pca', custom_lexicon=None, chamber='House', batch_size=None, boot=True, sims=1000, seed=1):
 
         self.model = model
         self.chamber = chamber
         self.M = self.model.vector_size
         self.country = country
         self.method = method
+        self.batch_size = batch_size
         self.custom_lexicon = custom_lexicon
         self.label_dict = party_labels(self.country)
         _, self.parties, _, _ = party_tags(self.model, self.country)
@@ -31,33 +32,27 @@ class Validate(object):
         self.placement = self.dimension_reduction()
         self.correlation, self.spearman = self.correlation_scores()
         self.p_accuracy = self.pairwise_accuracy()
+        self.intervals = self.bootstrap_intervals(sims=sims, seed=seed) if boot else None
 
     def dimension_reduction(self):
 
         z=np.zeros(( self.P, self.M ))
         for i in range( self.P ):
             z[i,:] = self.model.docvecs[self.parties[i]]
-        if self.method=='pca':
-            dr = PCA(n_components=self.components)
+        if self.method in PCA_METHODS:
+            dr = pca_backend(self.method, n_components=self.components, batch_size=self.batch_size)
             Z = dr.fit_transform(z)
         elif self.method=='guided':
             Z = custom_projection_1D(z, self.model, custom_lexicon=self.custom_lexicon)
         else:
-            raise ValueError("Method must be either pca or guided.")
+            raise ValueError("Method must be guided or one of %s." % ', '.join(PCA_METHODS))
         Z = pd.DataFrame(Z)
         Z.columns = ['score']
         Z['label'] = self.labels
 
         # Re-orienting the scale for substantive interpretation:
-        if self.country=='USA':
-            if Z[Z.label=='Dem 2015'].score.values[0] > Z[Z.label=='Rep 2015'].score.values[0]:
-                Z['score'] = Z.score * (-1)
-        elif self.country=='Canada':
-            if Z[Z.label=='NDP 2015'].score.values[0] > Z[Z.label=='Cons 2015'].score.values[0]:
-                Z['score'] = Z.score * (-1)
-        else:
-            if Z[Z.label=='Labour 2010'].score.values[0] > Z[Z.label=='Cons 2010'].score.values[0]:
-                Z['score'] = Z.score * (-1)
+        if reverse_scale(Z.score.values, self.labels, self.country):
+            Z['score'] = Z.score * (-1)
 
         if self.country=='USA':
             input_file = DATA_PATH + 'goldstandard_' + self.chamber.lower() + '.csv'
@@ -69,17 +64,38 @@ class Validate(object):
 
     def accuracy(self, gold, test):
         assert len(gold)==len(test)
-        pairs = 0
-        correct = 0
-        # Loop over unique pairs.
-        for i in range(len(test)):
-            for j in range(i+1,len(test)):
-                # Count pairs correctly ordered.
-                if np.sign(gold[i]-gold[j])==np.sign(test[i]-test[j]):
-                    correct += 1
-                pairs += 1
-        # Return pairwise accuracy as percentage.
-        return (correct/pairs)*100
+        # Share of unique pairs correctly ordered, as a percentage.
+        acc = pairwise_accuracy_rows(np.array(gold, dtype=float).reshape(1,-1), np.array(test, dtype=float).reshape(1,-1))
+        return acc[0]
+
+    def references(self):
+        if self.country=='USA':
+            return ['voteview']
+        return ['rile', 'vanilla', 'legacy']
+
+    def bootstrap_intervals(self, sims=1000, seed=1, alpha=0.05):
+
+        # Resamples gold-standard rows once into a (sims x n) index matrix; every metric is then
+        # computed for all replicates at once.
+        rng = np.random.RandomState(seed)
+        rows = []
+        for ref in self.references():
+            data = self.placement[[ref, 'score']].dropna()
+            gold = data[ref].values.astype(float)
+            test = data.score.values.astype(float)
+            n = len(gold)
+            idx = rng.randint(0, n, size=(sims, n))
+            G, T = gold[idx], test[idx]
+            boot = {'pearson': pearson_rows(G, T),
+                    'spearman': pearson_rows(rank_rows(G), rank_rows(T)),
+                    'accuracy': pairwise_accuracy_rows(G, T, idx=idx)}
+            estimates = {'pearson': dict(self.correlation)[ref],
+                         'spearman': dict(self.spearman)[ref],
+                         'accuracy': dict(self.p_accuracy)[ref]}
+            for metric in ['pearson', 'spearman', 'accuracy']:
+                lb, ub = np.nanpercentile(boot[metric], q=[100*alpha/2, 100*(1-alpha/2)])
+                rows.append((ref, metric, estimates[metric], lb, ub))
+        return pd.DataFrame(rows, columns=['reference', 'metric', 'estimate', 'lb', 'ub'])
 
     def correlation_scores(self):
 
@@ -119,15 +135,59 @@ class Validate(object):
 
     def print_accuracy(self):
 
+        ci = {}
+        if self.intervals is not None:
+            ci = {(r.reference, r.metric): (r.lb, r.ub) for r in self.intervals.itertuples()}
         print("Pearson Correlation Coefficient:")
         for d, c in self.correlation:
-            print("%s: %0.3f" %(d,c))
+            print("%s: %0.3f%s" %(d, c, format_ci(ci.get((d, 'pearson')), "%0.3f")))
         print()
         print("Spearman Rank Correlation Coefficient:")
         for d, c in self.spearman:
-            print("%s: %0.3f" %(d,c))
+            print("%s: %0.3f%s" %(d, c, format_ci(ci.get((d, 'spearman')), "%0.3f")))
         print()
         print("Pairwise Accuracy:")
         for d, c in self.p_accuracy:
-            print("%s: %0.2f%%" %(d,c))
+            print("%s: %0.2f%%%s" %(d, c, format_ci(ci.get((d, 'accuracy')), "%0.2f%%")))
         print()
+
+def format_ci(bounds, fmt):
+    if bounds is None:
+        return ''
+    return (" [95%% CI: " + fmt + ", " + fmt + "]") % bounds
+
+def pearson_rows(X, Y):
+    X = X - X.mean(axis=1, keepdims=True)
+    Y = Y - Y.mean(axis=1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (X*Y).sum(axis=1) / np.sqrt((X*X).sum(axis=1) * (Y*Y).sum(axis=1))
+
+def rank_rows(X, chunk=1000):
+    # Average ranks within each row, ties included (the ranking used by Spearman's rho).
+    R = np.zeros(X.shape)
+    for start in range(0, X.shape[0], chunk):
+        B = X[start:start+chunk]
+        less = (B[:, None, :] < B[:, :, None]).sum(axis=2)
+        equal = (B[:, None, :] == B[:, :, None]).sum(axis=2)
+        R[start:start+chunk] = less + (equal + 1) / 2.0
+    return R
+
+def pairwise_accuracy_rows(G, T, idx=None, chunk=1000):
+    # Percentage of pairs i<j ordered the same way by gold and test scores, for each row.
+    # With bootstrap indices idx, pairs drawing the same source row are left out: their
+    # tie would otherwise always count as correctly ordered.
+    n = G.shape[1]
+    iu = np.triu_indices(n, k=1)
+    acc = np.zeros(G.shape[0])
+    for start in range(0, G.shape[0], chunk):
+        g, t = G[start:start+chunk], T[start:start+chunk]
+        dg = np.sign(g[:, iu[0]] - g[:, iu[1]])
+        dt = np.sign(t[:, iu[0]] - t[:, iu[1]])
+        if idx is None:
+            acc[start:start+chunk] = (dg==dt).sum(axis=1) / len(iu[0]) * 100
+        else:
+            b = idx[start:start+chunk]
+            valid = b[:, iu[0]]!=b[:, iu[1]]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                acc[start:start+chunk] = ((dg==dt) & valid).sum(axis=1) / valid.sum(axis=1) * 100
+    return acc
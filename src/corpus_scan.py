@@ -0,0 +1,186 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+#=====================================================================#
+#
+# Description:
+# A single pass over the preprocessed corpus that fans out into
+# per-chamber and pooled statistics: word counts, bigram statistics
+# for the phrasers, doctag counts, and tokenized corpus shards. Each
+# chamber's Doc2Vec can then be initialized from the precomputed
+# vocabulary instead of scanning the full corpus with build_vocab().
+#
+# Passes saved: without phrasers, the scan replaces the build_vocab()
+# pass of every chamber. With bigrams and trigrams, as in
+# partyembeddings_house.py, the scan replaces the bigram-learning pass
+# of every chamber, but the trigram-learning pass and one counting
+# pass over the chamber shard remain (trigram-phrased counts need the
+# trigram phraser). That counting pass also writes a phrased shard,
+# so the training epochs read phrased tokens instead of phrasing
+# every speech again in each epoch.
+#
+# Shard format (gzip, one speech per line):
+# partytag \t congresstag \t token token token ...
+#
+# Usage:
+# python3 corpus_scan.py inpath outpath
+#
+#=====================================================================#
+
+import os
+import gzip
+import sys
+import pickle
+from collections import defaultdict
+from gensim.models.doc2vec import TaggedDocument
+from gensim.models.phrases import Phrases
+
+POOLED = 'pooled'
+
+class ChamberScan(object):
+
+    def __init__(self, name, max_vocab_size=40000000, phrase_batch=10000):
+        self.name = name
+        self.word_counts = defaultdict(int)
+        self.tag_counts = defaultdict(int)
+        self.corpus_count = 0
+        self.corpus_words = 0
+        self.max_vocab_size = max_vocab_size
+        self.min_reduce = 1
+        self.phrases = Phrases(max_vocab_size=max_vocab_size)
+        self.phrase_batch = phrase_batch
+        self.buffer = []
+
+    def add(self, tokens, tags):
+        for w in tokens:
+            self.word_counts[w] += 1
+        for t in tags:
+            self.tag_counts[t] += 1
+        self.corpus_count += 1
+        self.corpus_words += len(tokens)
+        # Phrase statistics are merged in batches; add_vocab has a fixed cost per call.
+        self.buffer.append(tokens)
+        if len(self.buffer) >= self.phrase_batch:
+            self.flush()
+        if len(self.word_counts) > self.max_vocab_size:
+            self.prune()
+
+    def flush(self):
+        if self.buffer:
+            self.phrases.add_vocab(self.buffer)
+            self.buffer = []
+
+    def prune(self):
+        # Same strategy as gensim's prune_vocab: drop rare words, raising the threshold each time.
+        for w in [w for w, c in self.word_counts.items() if c <= self.min_reduce]:
+            del self.word_counts[w]
+        self.min_reduce += 1
+
+def scan(inpath, outpath, chambers=('H', 'S'), pooled=True, max_vocab_size=40000000):
+
+    # One read of the corpus; counts and shards for every chamber are updated as lines stream by.
+    os.makedirs(outpath, exist_ok=True)
+    scans = {c: ChamberScan(c, max_vocab_size) for c in chambers}
+    if pooled:
+        scans[POOLED] = ChamberScan(POOLED, max_vocab_size)
+    shards = {c: gzip.open(os.path.join(outpath, 'shard_%s.gz' % c), 'wt', encoding='utf-8') for c in chambers}
+    idx = 0
+    try:
+        with open(inpath, 'r') as f:
+            for line in f:
+                ls = line.split('\t')
+                chamber = ls[5]
+                if chamber not in shards:
+                    continue
+                tokens = ls[10].replace('\n','').split()
+                congress = str(ls[0])
+                tags = [ls[7] + '_' + congress, 'CONGRESS_' + congress]
+                scans[chamber].add(tokens, tags)
+                if pooled:
+                    scans[POOLED].add(tokens, tags)
+                shards[chamber].write('\t'.join(tags) + '\t' + ' '.join(tokens) + '\n')
+                idx += 1
+                if idx%100000==0:
+                    print("Scanned %d lines." %idx)
+    finally:
+        for fh in shards.values():
+            fh.close()
+    for c, s in scans.items():
+        s.flush()
+        with open(os.path.join(outpath, 'scan_%s.pkl' % c), 'wb') as out_:
+            pickle.dump(s, out_)
+    return scans
+
+def load_scan(outpath, chamber):
+    with open(os.path.join(outpath, 'scan_%s.pkl' % chamber), 'rb') as f:
+        return pickle.load(f)
+
+class shardIterator(object):
+
+    def __init__(self, path, bigram=None, trigram=None, tags=True):
+        self.path = path
+        self.bigram = bigram
+        self.trigram = trigram
+        self.tags = tags
+
+    def __iter__(self):
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                partytag, congresstag, text = line.rstrip('\n').split('\t')
+                tokens = text.split()
+                if self.bigram:
+                    tokens = self.bigram[tokens]
+                if self.trigram:
+                    tokens = self.trigram[tokens]
+                if self.tags:
+                    yield TaggedDocument(tokens, [partytag, congresstag])
+                else:
+                    yield tokens
+
+def init_model(model, scan, corpus_count=None):
+
+    # Registers the doctags with a cheap pass over tag-only documents, then builds the word
+    # vocabulary from the precomputed counts instead of scanning the corpus.
+    # The counts of the scan are of unigrams; with phrasers, call phrased_counts first.
+    model.build_vocab([TaggedDocument([], [t]) for t in scan.tag_counts])
+    model.build_vocab_from_freq(dict(scan.word_counts), corpus_count=corpus_count or scan.corpus_count)
+    return model
+
+def phrased_counts(scan, shard_path, bigram, trigram=None, phrased_path=None):
+    # Word counts after phrasing, from the chamber shard only. If phrased_path is given, the
+    # phrased speeches are written there in the shard format, for training without phrasers.
+    counts = defaultdict(int)
+    out_ = gzip.open(phrased_path, 'wt', encoding='utf-8') if phrased_path else None
+    try:
+        for doc in shardIterator(shard_path, bigram=bigram, trigram=trigram):
+            for w in doc.words:
+                counts[w] += 1
+            if out_:
+                out_.write('\t'.join(doc.tags) + '\t' + ' '.join(doc.words) + '\n')
+    finally:
+        if out_:
+            out_.close()
+    scan.word_counts = counts
+    return scan
+
+if __name__=='__main__':
+
+    inpath = str(sys.argv[1])
+    outpath = str(sys.argv[2])
+    scans = scan(inpath, outpath)
+    for c, s in scans.items():
+        print("%s: %d speeches, %d words, %d word types." %(c, s.corpus_count, s.corpus_words, len(s.word_counts)))
+
+    """
+    Example usage for the House, with bigrams learned during the scan:
+
+    from gensim.models.doc2vec import Doc2Vec
+    from gensim.models.phrases import Phraser
+    house = load_scan(outpath, 'H')
+    bigram = Phraser(house.phrases)
+    trigram = Phraser(Phrases(shardIterator(outpath + '/shard_H.gz', bigram=bigram, tags=False)))
+    house = phrased_counts(house, outpath + '/shard_H.gz', bigram, trigram, phrased_path=outpath + '/phrased_H.gz')
+    model0 = Doc2Vec(vector_size=200, window=20, min_count=50, workers=8, epochs=5)
+    model0 = init_model(model0, house)
+    model0.train(shardIterator(outpath + '/phrased_H.gz'), total_examples=model0.corpus_count, epochs=model0.epochs)
+    """
@@ -0,0 +1,121 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+#=====================================================================#
+#
+# Description:
+# Converts the tab-separated corpus produced by reformat_congress.py
+# (and optionally extended by preprocess.py) into a columnar store,
+# partitioned by chamber and congress, with each column saved in its
+# own gzip-compressed file. Text columns are kept apart from metadata,
+# so that iterators only decompress what they actually need.
+#
+# Store layout:
+# store/H/043/party.gz
+# store/H/043/speech_id.gz
+# store/H/043/clean.gz
+# ...
+#
+# Usage:
+# python3 corpus_store.py inpath storepath
+#
+#=====================================================================#
+
+import os
+import gzip
+import sys
+from collections import OrderedDict
+
+# Column ordering from reformat_congress.py, with the clean text appended by preprocess.py.
+COLUMNS = ['congress', 'speech_id', 'speech', 'speakerid', 'namec', 'chamber',
+           'state', 'party', 'majority', 'president', 'clean']
+TEXT_COLUMNS = ['speech', 'clean']
+
+def partition_path(storepath, chamber, congress):
+    return os.path.join(storepath, chamber, '%03d' % int(congress))
+
+def list_partitions(storepath, chamber=None, congresses=None):
+    partitions = []
+    chambers = [chamber] if chamber else sorted(os.listdir(storepath))
+    for c in chambers:
+        cpath = os.path.join(storepath, c)
+        if not os.path.isdir(cpath):
+            continue
+        for congress in sorted(os.listdir(cpath)):
+            if congresses and int(congress) not in congresses:
+                continue
+            partitions.append((c, int(congress)))
+    return partitions
+
+def convert(inpath, storepath, skip_columns=('congress', 'chamber'), compresslevel=6, max_open=4):
+
+    # Congress and chamber are encoded in the partition path, not stored as columns.
+    # The input is ordered by congress, so only the few most recently used partitions are
+    # kept open; a partition seen again after being closed is appended to (gzip members
+    # concatenate transparently on reading).
+    handles = OrderedDict()
+    seen = set()
+    def close(files):
+        for fh in files.values():
+            fh.close()
+    def column_files(chamber, congress, ncols):
+        key = (chamber, congress)
+        if key in handles:
+            handles.move_to_end(key)
+        else:
+            if len(handles) >= max_open:
+                close(handles.popitem(last=False)[1])
+            path = partition_path(storepath, chamber, congress)
+            os.makedirs(path, exist_ok=True)
+            mode = 'at' if key in seen else 'wt'
+            seen.add(key)
+            handles[key] = {col: gzip.open(os.path.join(path, col + '.gz'), mode, encoding='utf-8', compresslevel=compresslevel)
+                            for col in COLUMNS[:ncols] if col not in skip_columns}
+        return handles[key]
+
+    idx = 0
+    try:
+        with open(inpath, 'r', encoding='utf-8') as f:
+            for line in f:
+                ls = line.rstrip('\n').split('\t')
+                files = column_files(ls[5], ls[0], len(ls))
+                for col, value in zip(COLUMNS, ls):
+                    if col in files:
+                        files[col].write(value + '\n')
+                idx += 1
+                if idx%100000==0:
+                    print("Converted %d lines." %idx)
+    finally:
+        for files in handles.values():
+            close(files)
+    return idx
+
+def read_columns(storepath, columns, chamber=None, congresses=None):
+
+    # Streams rows of the requested columns, reading only the matching partitions.
+    for c, congress in list_partitions(storepath, chamber, congresses):
+        path = partition_path(storepath, c, congress)
+        files = [gzip.open(os.path.join(path, col + '.gz'), 'rt', encoding='utf-8')
+                 for col in columns if col not in ('congress', 'chamber')]
+        try:
+            for values in zip(*files):
+                values = iter(values)
+                row = []
+                for col in columns:
+                    if col=='congress':
+                        row.append(str(congress))
+                    elif col=='chamber':
+                        row.append(c)
+                    else:
+                        row.append(next(values)[:-1])
+                yield row
+        finally:
+            for fh in files:
+                fh.close()
+
+if __name__=='__main__':
+
+    inpath = str(sys.argv[1])
+    storepath = str(sys.argv[2])
+    n = convert(inpath, storepath)
+    print("Stored %d speeches in %s." %(n, storepath))
@@ -0,0 +1,165 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+#=====================================================================#
+#
+# Description:
+# Removes near-duplicate speeches (unanimous consent requests,
+# yielding time, other procedural boilerplate) from the preprocessed
+# corpus before training. MinHash signatures of word shingles are
+# computed in parallel over the clean text column, and locality
+# sensitive hashing proposes candidate clusters. A speech joins a
+# candidate cluster only if its signature agreement with the cluster's
+# first speech (an estimate of their Jaccard similarity) reaches the
+# threshold. The first `keep` speeches of each cluster are written
+# out. The file is streamed, and the LSH index (one 64-bit key per
+# band and one signature per cluster) is reset at each new congress,
+# so memory is bounded by the distinct speeches of one congress:
+# about 1.5KB per speech, a few hundred MB for the largest congress.
+# The input is expected in congress order, as written by
+# reformat_congress.py; duplicates are only detected within a
+# congress.
+#
+# Input: output of preprocess.py, with clean text in column #10.
+#
+# Usage:
+# python3 deduplicate.py inpath outpath reportpath
+#
+#=====================================================================#
+
+import sys
+import zlib
+import hashlib
+import numpy as np
+import pandas as pd
+from collections import defaultdict
+from multiprocessing import Pool
+
+PRIME = (1 << 61) - 1
+
+class MinHasher(object):
+
+    def __init__(self, num_perm=64, bands=16, shingle=3, seed=1):
+        assert num_perm % bands == 0
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, 1 << 31, size=num_perm).astype(np.uint64)
+        self.b = rng.randint(0, 1 << 31, size=num_perm).astype(np.uint64)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle = shingle
+
+    def shingles(self, tokens):
+        k = min(self.shingle, len(tokens))
+        grams = set(' '.join(tokens[i:i+k]) for i in range(len(tokens) - k + 1))
+        return np.array([zlib.crc32(g.encode('utf-8')) for g in grams], dtype=np.uint64)
+
+    def signature(self, text):
+        x = self.shingles(text.split())
+        if len(x)==0:
+            return (), None
+        # Universal hashing of all shingles under all permutations at once; products stay below 2**63.
+        sig = ((x.reshape(-1,1) * self.a + self.b) % np.uint64(PRIME)).min(axis=0)
+        # A stable digest (unlike hash()) so that keys agree across worker processes.
+        keys = tuple(int.from_bytes(hashlib.blake2b(sig[i*self.rows:(i+1)*self.rows].tobytes(), digest_size=8).digest(), 'little')
+                     for i in range(self.bands))
+        # The low 32 bits are enough to compare signatures and halve the memory per cluster.
+        return keys, sig.astype(np.uint32)
+
+_hasher = None
+
+def _init_worker(num_perm, bands, shingle, seed):
+    global _hasher
+    _hasher = MinHasher(num_perm, bands, shingle, seed)
+
+def _signatures(lines):
+    return [_hasher.signature(line.split('\t')[10].replace('\n','')) for line in lines]
+
+def _read_chunks(f, chunksize):
+    chunk = []
+    for line in f:
+        chunk.append(line)
+        if len(chunk)==chunksize:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+class ClusterIndex(object):
+
+    # Band key -> cluster id, and the signature of each cluster's first speech, stored in one
+    # growing array rather than as separate objects.
+    def __init__(self, num_perm):
+        self.buckets = {}
+        self.signatures = np.zeros((1024, num_perm), dtype=np.uint32)
+        self.size = np.zeros(1024, dtype=np.int64)
+        self.n = 0
+
+    def find(self, bkeys, sig, threshold):
+        # Band collisions only propose candidates; the full signatures decide.
+        candidates = set(self.buckets[key] for key in bkeys if key in self.buckets)
+        cluster, best = None, threshold
+        for c in candidates:
+            similarity = np.mean(self.signatures[c]==sig)
+            if similarity >= best:
+                cluster, best = c, similarity
+        return cluster
+
+    def add(self, bkeys, sig):
+        if self.n==len(self.size):
+            self.signatures = np.vstack((self.signatures, np.zeros_like(self.signatures)))
+            self.size = np.concatenate((self.size, np.zeros_like(self.size)))
+        cluster = self.n
+        self.n += 1
+        if sig is not None:
+            self.signatures[cluster] = sig
+        # A key already held by another (dissimilar) cluster keeps pointing to it; the new
+        # cluster remains reachable through its other bands.
+        for key in bkeys:
+            self.buckets.setdefault(key, cluster)
+        return cluster
+
+def deduplicate(inpath, outpath, keep=1, threshold=0.8, num_perm=64, bands=16, shingle=3, seed=1, workers=8, chunksize=10000):
+
+    # threshold: minimum estimated Jaccard similarity of shingles for a speech to count as a duplicate.
+    index = ClusterIndex(num_perm)
+    congress = None
+    total = defaultdict(int)
+    removed = defaultdict(int)
+    with open(inpath, 'r') as f, open(outpath, 'w') as out_, \
+         Pool(processes=workers, initializer=_init_worker, initargs=(num_perm, bands, shingle, seed)) as pool:
+        chunks = _read_chunks(f, chunksize)
+        while True:
+            # A wave of a few chunks per worker bounds the number of lines in memory.
+            wave = [c for _, c in zip(range(2*workers), chunks)]
+            if not wave:
+                break
+            for lines, sigs in zip(wave, pool.map(_signatures, wave)):
+                for line, (bkeys, sig) in zip(lines, sigs):
+                    ls = line.split('\t')
+                    group = (ls[7], ls[0])
+                    total[group] += 1
+                    if ls[0]!=congress:
+                        index = ClusterIndex(num_perm)
+                        congress = ls[0]
+                    cluster = index.find(bkeys, sig, threshold)
+                    if cluster is None:
+                        cluster = index.add(bkeys, sig)
+                    index.size[cluster] += 1
+                    if index.size[cluster] <= keep:
+                        out_.write(line)
+                    else:
+                        removed[group] += 1
+            print("Processed %d lines, removed %d." %(sum(total.values()), sum(removed.values())))
+    report = pd.DataFrame([(p, c, n, removed[(p, c)]) for (p, c), n in total.items()],
+                          columns=['party', 'congress', 'speeches', 'removed'])
+    report['share_removed'] = report.removed / report.speeches
+    return report.sort_values(by=['congress', 'party']).reset_index(drop=True)
+
+if __name__=='__main__':
+
+    inpath = str(sys.argv[1])
+    outpath = str(sys.argv[2])
+    reportpath = str(sys.argv[3])
+    report = deduplicate(inpath, outpath)
+    report.to_csv(reportpath, index=False)
+    print("Removed %d of %d speeches." %(report.removed.sum(), report.speeches.sum()))
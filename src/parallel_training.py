@@ -0,0 +1,128 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+#=====================================================================#
+#
+# Description:
+# Data-parallel Doc2Vec training. The vocabulary is built once and
+# saved as a template model. The unphrased chamber shard written by
+# corpus_scan.py is split line by line into one file per process,
+# before any phrasing. Each process then phrases and trains a local
+# copy on its own file, so no process reads the whole corpus. After
+# each synchronization round, the word vectors, doctag vectors and
+# output weights of the local models are averaged into the template.
+# The result is an ordinary Doc2Vec model that Explore can load.
+#
+# Usage, with the outputs of corpus_scan.py:
+#
+# model0 = Doc2Vec(vector_size=200, window=20, min_count=50, workers=8, epochs=5)
+# model0 = init_model(model0, house)
+# model0.save(savepath + 'house_template')
+# shards = split_shards(outpath + '/shard_H.gz', savepath + 'parts', 8)
+# model = train_parallel(shards, savepath + 'house_template', savepath + 'house',
+#                        bigram=savepath + 'bigram', trigram=savepath + 'trigram')
+# print(scaling_benchmark(outpath + '/shard_H.gz', savepath + 'house_template', savepath + 'bench'))
+#
+#=====================================================================#
+
+import os
+import gzip
+import time
+import logging
+import numpy as np
+import pandas as pd
+from multiprocessing import Pool
+from gensim.models.doc2vec import Doc2Vec
+from gensim.models.phrases import Phraser
+from corpus_scan import shardIterator
+
+# Trainable arrays averaged across processes, as (owner, attribute) pairs.
+PARAMETERS = [('wv', 'vectors'), ('docvecs', 'vectors_docs'), ('trainables', 'syn1neg'), ('trainables', 'syn1')]
+
+def split_shards(shard_path, outdir, n_shards):
+
+    # Round-robin split of raw shard lines; nothing is tokenized or phrased here.
+    os.makedirs(outdir, exist_ok=True)
+    paths = [os.path.join(outdir, 'part_%03d.gz' % i) for i in range(n_shards)]
+    counts = [0] * n_shards
+    outs = [gzip.open(p, 'wt', encoding='utf-8') for p in paths]
+    try:
+        with gzip.open(shard_path, 'rt', encoding='utf-8') as f:
+            for i, line in enumerate(f):
+                outs[i % n_shards].write(line)
+                counts[i % n_shards] += 1
+    finally:
+        for fh in outs:
+            fh.close()
+    return list(zip(paths, counts))
+
+def get_parameters(model):
+    params = {}
+    for owner, attr in PARAMETERS:
+        value = getattr(getattr(model, owner), attr, None)
+        if value is not None and len(value) > 0:
+            params[(owner, attr)] = value
+    return params
+
+_phrasers = (None, None)
+
+def _init_worker(bigram, trigram):
+    # Phrasers are loaded once per process, not sent with every round.
+    global _phrasers
+    _phrasers = (Phraser.load(bigram) if bigram else None, Phraser.load(trigram) if trigram else None)
+
+def _train_shard(args):
+    template, shard_path, total, epochs, start_alpha, end_alpha, workers = args
+    model = Doc2Vec.load(template)
+    model.workers = workers
+    bigram, trigram = _phrasers
+    model.train(shardIterator(shard_path, bigram=bigram, trigram=trigram), total_examples=total, epochs=epochs,
+                start_alpha=start_alpha, end_alpha=end_alpha)
+    return get_parameters(model)
+
+def train_parallel(shards, template, savepath, bigram=None, trigram=None, epochs=5, sync_every=1, workers_per_process=2):
+
+    # shards: (path, number of speeches) pairs from split_shards, one process per shard.
+    # template: path to a Doc2Vec saved after build_vocab(); bigram, trigram: paths to saved Phrasers.
+    model = Doc2Vec.load(template)
+    alpha, min_alpha = model.alpha, model.min_alpha
+    rounds = int(np.ceil(epochs / float(sync_every)))
+    current = template
+    with Pool(processes=len(shards), initializer=_init_worker, initargs=(bigram, trigram)) as pool:
+        for r in range(rounds):
+            e0, e1 = r * sync_every, min(epochs, (r + 1) * sync_every)
+            start_alpha = alpha - (alpha - min_alpha) * e0 / epochs
+            end_alpha = alpha - (alpha - min_alpha) * e1 / epochs
+            t0 = time.time()
+            results = pool.map(_train_shard, [(current, path, n, e1 - e0, start_alpha, end_alpha, workers_per_process)
+                                              for path, n in shards], chunksize=1)
+            # Parameter averaging across the local models.
+            for (owner, attr), value in get_parameters(model).items():
+                value[:] = np.mean([res[(owner, attr)] for res in results], axis=0)
+            current = savepath + '_round'
+            model.save(current)
+            logging.info("Round %d/%d: epochs %d-%d in %0.1fs" % (r + 1, rounds, e0 + 1, e1, time.time() - t0))
+    model.alpha, model.min_alpha = alpha, min_alpha
+    model.save(savepath)
+    for f in os.listdir(os.path.dirname(savepath) or '.'):
+        if f.startswith(os.path.basename(savepath) + '_round'):
+            os.remove(os.path.join(os.path.dirname(savepath), f))
+    return model
+
+def scaling_benchmark(shard_path, template, savepath, processes=(1, 2, 4, 8), bigram=None, trigram=None, epochs=5,
+                      sync_every=1, workers_per_process=2, country='USA', chamber='House'):
+
+    # Wall time and Validate scores for each number of processes; splitting is not timed.
+    from partyembed.validate import Validate
+    rows = []
+    for n in processes:
+        shards = split_shards(shard_path, savepath + '_%dparts' % n, n)
+        t0 = time.time()
+        model = train_parallel(shards, template, savepath + '_%dproc' % n, bigram=bigram, trigram=trigram, epochs=epochs,
+                               sync_every=sync_every, workers_per_process=workers_per_process)
+        seconds = time.time() - t0
+        v = Validate(model, country, chamber=chamber, boot=False)
+        rows.append((n, seconds, v.correlation[0][1], v.spearman[0][1], v.p_accuracy[0][1]))
+    res = pd.DataFrame(rows, columns=['processes', 'seconds', 'pearson', 'spearman', 'accuracy'])
+    res['speedup'] = res.seconds.values[0] / res.seconds
+    return res
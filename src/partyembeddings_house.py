@@ -19,6 +19,8 @@ from gensim.models.doc2vec import Doc2Vec, LabeledSentence
 from gensim.models.phrases import Phrases, Phraser
 from gensim import corpora
 from collections import namedtuple
+from corpus_store import read_columns
+from training import train_with_checkpoints
 import logging
 
 logging.basicConfig(format='%(asctime)s : %(levelname)s : %(message)s', level=logging.INFO)
@@ -26,7 +28,7 @@ assert gensim.models.doc2vec.FAST_VERSION > -1
 
 class corpusIterator(object):
 
-    def __init__(self, inpath, house, bigram=None, trigram=None):
+    def __init__(self, inpath, house, bigram=None, trigram=None, store=False, congresses=None):
         if bigram:
             self.bigram = bigram
         else:
@@ -37,43 +39,58 @@ class corpusIterator(object):
             self.trigram = None
         self.house = house
         self.inpath = inpath
+        self.store = store
+        self.congresses = congresses
+
+    def rows(self):
+        if self.store:
+            # Columnar store: only the partitions for this chamber and three columns are decompressed.
+            for congress, party, text in read_columns(self.inpath, ['congress', 'party', 'clean'],
+                                                      chamber=self.house, congresses=self.congresses):
+                yield congress, party, text
+        else:
+            with open(self.inpath, 'r') as f:
+                for line in f:
+                    ls = line.split('\t')
+                    chamber = ls[5]
+                    if chamber==self.house:
+                        yield str(ls[0]), ls[7], ls[10].replace('\n','')
 
     def __iter__(self):
         self.speeches = namedtuple('speeches', 'words tags')
-        with open(self.inpath, 'r') as f:
-            for line in f:
-                ls = line.split('\t')
-                chamber = ls[5]
-                if chamber==self.house:
-                    text = ls[10].replace('\n','')
-                    congress = str(ls[0])
-                    party = ls[7]
-                    partytag = party + '_' + congress
-                    congresstag = 'CONGRESS_' + congress
-                    tokens = text.split()
-                    if self.bigram and self.trigram:
-                        self.words = self.trigram[self.bigram[tokens]]
-                    elif self.bigram and not self.trigram:
-                        self.words = self.bigram[tokens]
-                    else:
-                        self.words = tokens
-                    self.tags = [partytag, congresstag]
-                    yield self.speeches(self.words, self.tags)
+        for congress, party, text in self.rows():
+            partytag = party + '_' + congress
+            congresstag = 'CONGRESS_' + congress
+            tokens = text.split()
+            if self.bigram and self.trigram:
+                self.words = self.trigram[self.bigram[tokens]]
+            elif self.bigram and not self.trigram:
+                self.words = self.bigram[tokens]
+            else:
+                self.words = tokens
+            self.tags = [partytag, congresstag]
+            yield self.speeches(self.words, self.tags)
 
 class phraseIterator(object):
 
-    def __init__(self, inpath, house):
+    def __init__(self, inpath, house, store=False, congresses=None):
         self.inpath = inpath
         self.house = house
+        self.store = store
+        self.congresses = congresses
 
     def __iter__(self):
-        with open(self.inpath, 'r') as f:
-            for line in f:
-                ls = line.split('\t')
-                chamber = ls[5]
-                if chamber==self.house:
-                    text = ls[10].replace('\n','')
-                    yield text.split()
+        if self.store:
+            for text, in read_columns(self.inpath, ['clean'], chamber=self.house, congresses=self.congresses):
+                yield text.split()
+        else:
+            with open(self.inpath, 'r') as f:
+                for line in f:
+                    ls = line.split('\t')
+                    chamber = ls[5]
+                    if chamber==self.house:
+                        text = ls[10].replace('\n','')
+                        yield text.split()
 
 if __name__=='__main__':
 
@@ -84,6 +101,10 @@ if __name__=='__main__':
     inpath = '.../congress'
     savepath = '.../usa/'
 
+    # Alternatively, convert the corpus once with corpus_store.py and pass store=True
+    # to the iterators below, so that each pass only reads the House partitions:
+    # inpath = '.../congress_store'
+
     phrases = Phrases(phraseIterator(inpath, house='H'))
     bigram = Phraser(phrases)
     tphrases = Phrases(bigram[phraseIterator(inpath, house='H')])
@@ -95,5 +116,8 @@ if __name__=='__main__':
 
     model0 = Doc2Vec(vector_size=200, window=20, min_count=50, workers=8, epochs=5)
     model0.build_vocab(corpusIterator(inpath, house='H', bigram=bigram, trigram=trigram))
-    model0.train(corpusIterator(inpath, house='H', bigram=bigram, trigram=trigram), total_examples=model0.corpus_count, epochs=model0.epochs)
+    # Trains one epoch at a time with checkpoints in savepath/checkpoints; rerunning resumes
+    # from the last completed epoch. Set validate=True to stop early on the voteview correlation.
+    model0 = train_with_checkpoints(model0, corpusIterator(inpath, house='H', bigram=bigram, trigram=trigram),
+                                    savepath + 'checkpoints', metrics_path=savepath + 'metrics.csv', validate=False)
     model0.save(savepath + 'house')
@@ -0,0 +1,243 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+#=====================================================================#
+#
+# Description:
+# Runs reformatting, cleaning, phrasing and tagging as one streaming
+# pipeline, from the raw Hein files to a tagged corpus shard ready for
+# training (the shard format of corpus_scan.py). Stages run
+# concurrently and pass batches of lines through bounded queues, so a
+# slow stage blocks its upstream stages instead of letting memory
+# grow. CPU-bound stages can use a pool of worker processes. A stage
+# writes its output to disk only when it is marked cacheable; on a
+# rerun, the pipeline starts from the last complete cache and skips
+# the stages before it.
+# Per-stage throughput and the bottleneck stage are reported at the
+# end.
+#
+# Usage:
+# python3 pipeline.py outpath [bigram_path trigram_path]
+#
+#=====================================================================#
+
+import os
+import sys
+import time
+import gzip
+import queue
+import threading
+from functools import partial
+from multiprocessing import Pool
+from gensim.models.phrases import Phraser
+from preprocess import clean_text
+from reformat_congress import corpus_rows
+
+_DONE = object()
+
+class Stage(object):
+
+    def __init__(self, name, func, processes=0, cacheable=False, cache_path=None):
+        # func maps one line to an output line, or None to drop it.
+        self.name = name
+        self.func = func
+        self.processes = processes
+        self.cacheable = cacheable
+        self.cache_path = cache_path
+        self.items = 0
+        self.busy = 0.0
+        self.waiting_input = 0.0
+        self.waiting_output = 0.0
+
+    def run(self, inq, outq, stop):
+        # Worker processes receive the stage function once, not with every line.
+        pool = Pool(processes=self.processes, initializer=_init_worker, initargs=(self.func,)) if self.processes else None
+        # The cache is written under a temporary name and renamed once complete, so an
+        # interrupted run never leaves a partial cache that a rerun would trust.
+        cache = gzip.open(self.cache_path + '.tmp', 'wt', encoding='utf-8') if self.cacheable and self.cache_path else None
+        complete = False
+        try:
+            while True:
+                t0 = time.time()
+                batch = _get(inq, stop)
+                t1 = time.time()
+                self.waiting_input += t1 - t0
+                if batch is _DONE:
+                    complete = not stop.is_set()
+                    break
+                if pool:
+                    out = pool.map(_apply, batch, chunksize=max(1, len(batch) // (4*self.processes)))
+                else:
+                    out = [self.func(l) for l in batch]
+                out = [l for l in out if l is not None]
+                t2 = time.time()
+                self.busy += t2 - t1
+                self.items += len(batch)
+                if cache:
+                    cache.writelines(out)
+                if not _put(outq, out, stop):
+                    break
+                self.waiting_output += time.time() - t2
+            _put(outq, _DONE, stop)
+        finally:
+            if cache:
+                cache.close()
+                if complete:
+                    os.replace(self.cache_path + '.tmp', self.cache_path)
+            if pool:
+                if stop.is_set():
+                    pool.terminate()
+                else:
+                    pool.close()
+                pool.join()
+
+def _put(q, item, stop, timeout=0.1):
+    # Blocks while the queue is full, but gives up once the pipeline is stopped.
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=timeout)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+def _get(q, stop, timeout=0.1):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=timeout)
+        except queue.Empty:
+            pass
+    return _DONE
+
+_func = None
+
+def _init_worker(func):
+    global _func
+    _func = func
+
+def _apply(line):
+    return _func(line)
+
+def clean_line(line, country='USA'):
+    # Appends the clean text as column #10, as in preprocess.py.
+    text = clean_text(line.split('\t')[2], country)
+    if text=='':
+        return None
+    return line[:-1] + '\t' + text + '\n'
+
+def phrase_line(line, phrasers=()):
+    ls = line[:-1].split('\t')
+    tokens = ls[10].split()
+    for p in phrasers:
+        tokens = p[tokens]
+    ls[10] = ' '.join(tokens)
+    return '\t'.join(ls) + '\n'
+
+def tag_line(line, house=None):
+    # Output in the shard format of corpus_scan.py: partytag, congresstag, tokens.
+    ls = line[:-1].split('\t')
+    if house and ls[5]!=house:
+        return None
+    congress = str(ls[0])
+    return ls[7] + '_' + congress + '\t' + 'CONGRESS_' + congress + '\t' + ls[10] + '\n'
+
+def _read_cache(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            yield line
+
+class Pipeline(object):
+
+    def __init__(self, source, stages, outpath, batch_size=1000, queue_size=8):
+        # Stages up to the last one with a complete cache are skipped; its cache becomes the source.
+        self.skipped = []
+        for i, stage in enumerate(stages):
+            if stage.cacheable and stage.cache_path and os.path.exists(stage.cache_path):
+                self.skipped = stages[:i+1]
+        if self.skipped:
+            source = _read_cache(self.skipped[-1].cache_path)
+            stages = stages[len(self.skipped):]
+        self.source = source
+        self.stages = stages
+        self.outpath = outpath
+        self.batch_size = batch_size
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+        self.source_time = 0.0
+        self.sink_time = 0.0
+        self.stop = threading.Event()
+        self.error = None
+
+    def _guard(self, func, *args):
+        # The first exception in any thread stops every stage; it is re-raised by run().
+        try:
+            func(*args)
+        except BaseException as e:
+            if self.error is None:
+                self.error = e
+            self.stop.set()
+
+    def feed(self):
+        batch = []
+        t0 = time.time()
+        for line in self.source:
+            batch.append(line)
+            if len(batch)==self.batch_size:
+                self.source_time += time.time() - t0
+                if not _put(self.queues[0], batch, self.stop):
+                    return
+                batch = []
+                t0 = time.time()
+        self.source_time += time.time() - t0
+        if batch and not _put(self.queues[0], batch, self.stop):
+            return
+        _put(self.queues[0], _DONE, self.stop)
+
+    def sink(self):
+        with gzip.open(self.outpath, 'wt', encoding='utf-8') as out_:
+            while True:
+                batch = _get(self.queues[-1], self.stop)
+                if batch is _DONE:
+                    break
+                t0 = time.time()
+                out_.writelines(batch)
+                self.sink_time += time.time() - t0
+
+    def run(self):
+        start = time.time()
+        threads = [threading.Thread(target=self._guard, args=(self.feed,), daemon=True)]
+        for i, stage in enumerate(self.stages):
+            threads.append(threading.Thread(target=self._guard, args=(stage.run, self.queues[i], self.queues[i+1], self.stop), daemon=True))
+        for t in threads:
+            t.start()
+        self._guard(self.sink)
+        for t in threads:
+            t.join()
+        if self.error is not None:
+            raise self.error
+        self.elapsed = time.time() - start
+        return self.report()
+
+    def report(self):
+        rows = [('source', None, self.source_time, self.source_time / self.elapsed)]
+        for s in self.stages:
+            rows.append((s.name, s.items / s.busy if s.busy else float('inf'), s.busy, s.busy / self.elapsed))
+        rows.append(('sink', None, self.sink_time, self.sink_time / self.elapsed))
+        # The bottleneck is the stage busy for the largest share of the wall time.
+        bottleneck = max(rows, key=lambda r: r[3])[0]
+        if self.skipped:
+            print("Reused the cache of stage '%s'; skipped %s." %(self.skipped[-1].name, ', '.join(s.name for s in self.skipped)))
+        print("%-12s %14s %10s %8s" %('stage', 'lines/sec', 'busy (s)', 'busy %'))
+        for name, rate, busy, share in rows:
+            print("%-12s %14s %10.1f %7.1f%%" %(name, '%0.0f' % rate if rate else '-', busy, 100*share))
+        print("Bottleneck: %s (total %0.1fs)" %(bottleneck, self.elapsed))
+        return rows, bottleneck
+
+if __name__=='__main__':
+
+    outpath = str(sys.argv[1])
+    phrasers = [Phraser.load(p) for p in sys.argv[2:4]]
+    stages = [Stage('clean', partial(clean_line, country='USA'), processes=8, cacheable=True, cache_path=outpath + '.clean.gz')]
+    if phrasers:
+        stages.append(Stage('phrase', partial(phrase_line, phrasers=phrasers), processes=4))
+    stages.append(Stage('tag', partial(tag_line, house='H')))
+    Pipeline(corpus_rows(), stages, outpath).run()
@@ -0,0 +1,127 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+#=====================================================================#
+#
+# Description:
+# Draws a stratified subsample of the corpus, by party-session tag,
+# sized so that a quick model trains within a given time budget on
+# the current machine. The training rate (words/sec) is measured on
+# a short calibration run over a hash-stratified slice of the corpus,
+# phrased with the same phrasers as the real run. Speeches are
+# selected by a seeded hash of their speech ID, so samples are
+# reproducible and nested: a larger fraction always contains a
+# smaller one.
+#
+# Usage:
+# python3 sample_corpus.py inpath outpath minutes [bigram_path trigram_path]
+#
+#=====================================================================#
+
+import sys
+import time
+import hashlib
+import pandas as pd
+from collections import defaultdict
+from gensim.models.doc2vec import Doc2Vec, TaggedDocument
+from gensim.models.phrases import Phraser
+
+def stratum_counts(inpath, house):
+    speeches = defaultdict(int)
+    words = defaultdict(int)
+    with open(inpath, 'r') as f:
+        for line in f:
+            ls = line.split('\t')
+            if ls[5]==house:
+                partytag = ls[7] + '_' + str(ls[0])
+                speeches[partytag] += 1
+                words[partytag] += len(ls[10].split())
+    return speeches, words
+
+def measure_rate(inpath, house, speeches, n_speeches=20000, bigram=None, trigram=None, seed=1, **params):
+
+    # Words per second for one epoch on a hash-stratified slice of about n speeches, phrasing
+    # included. Words are counted before phrasing, as in the totals of stratum_counts.
+    fraction = min(1.0, n_speeches / float(sum(speeches.values())))
+    docs, words, phrasing = [], 0, 0.0
+    with open(inpath, 'r') as f:
+        for line in f:
+            ls = line.split('\t')
+            if ls[5]!=house or not keep_speech(ls[1], seed, fraction):
+                continue
+            tokens = ls[10].split()
+            words += len(tokens)
+            # Phrasing is part of every training epoch, so its cost is counted in the rate.
+            t0 = time.time()
+            if bigram:
+                tokens = bigram[tokens]
+            if trigram:
+                tokens = trigram[tokens]
+            phrasing += time.time() - t0
+            docs.append(TaggedDocument(tokens, [ls[7] + '_' + str(ls[0]), 'CONGRESS_' + str(ls[0])]))
+    # min_count is scaled with the slice, so that the vocabulary is not trimmed more than in the full run.
+    params = dict(params)
+    params['min_count'] = max(1, int(round(params.get('min_count', 5) * fraction)))
+    model = Doc2Vec(epochs=1, **params)
+    model.build_vocab(docs)
+    t0 = time.time()
+    model.train(docs, total_examples=len(docs), epochs=1)
+    return words / (time.time() - t0 + phrasing)
+
+def sample_fraction(total_words, rate, budget_seconds, epochs=5):
+    return min(1.0, rate * budget_seconds / (epochs * float(total_words)))
+
+def keep_speech(speech_id, seed, fraction):
+    h = hashlib.md5(('%s_%s' % (seed, speech_id)).encode('utf-8')).hexdigest()
+    return int(h[:12], 16) / float(16**12) < fraction
+
+def stratified_sample(inpath, outpath, house, fraction, speeches=None, seed=1, min_per_stratum=50):
+
+    # The same fraction in every party-session, raised where needed so that small strata keep
+    # at least min_per_stratum speeches in expectation.
+    if speeches is None:
+        speeches, _ = stratum_counts(inpath, house)
+    rates = {t: min(1.0, max(fraction, min_per_stratum / float(n))) for t, n in speeches.items()}
+    kept = defaultdict(int)
+    with open(inpath, 'r') as f, open(outpath, 'w') as out_:
+        for line in f:
+            ls = line.split('\t')
+            if ls[5]!=house:
+                continue
+            partytag = ls[7] + '_' + str(ls[0])
+            if keep_speech(ls[1], seed, rates[partytag]):
+                out_.write(line)
+                kept[partytag] += 1
+    return pd.DataFrame([(t, speeches[t], kept[t]) for t in sorted(speeches)], columns=['partytag', 'speeches', 'sampled'])
+
+def compare_validation(quick_model, full_model, country='USA', chamber='House', method='pca'):
+
+    # How closely the quick model's Validate scores track those of the full model.
+    from partyembed.validate import Validate
+    quick = Validate(quick_model, country, method=method, chamber=chamber, boot=False)
+    full = Validate(full_model, country, method=method, chamber=chamber, boot=False)
+    rows = []
+    for metric, q, f in [('pearson', quick.correlation, full.correlation),
+                         ('spearman', quick.spearman, full.spearman),
+                         ('accuracy', quick.p_accuracy, full.p_accuracy)]:
+        for (ref, qv), (_, fv) in zip(q, f):
+            rows.append((ref, metric, qv, fv, qv - fv))
+    res = pd.DataFrame(rows, columns=['reference', 'metric', 'quick', 'full', 'difference'])
+    placement = quick.placement[['label', 'score']].merge(full.placement[['label', 'score']], on='label', suffixes=('_quick', '_full'))
+    # Also returns the correlation between the two sets of party placements.
+    return res, placement.score_quick.corr(placement.score_full)
+
+if __name__=='__main__':
+
+    inpath = str(sys.argv[1])
+    outpath = str(sys.argv[2])
+    budget = float(sys.argv[3]) * 60
+    phrasers = [Phraser.load(p) for p in sys.argv[4:6]] + [None, None]
+    params = dict(vector_size=200, window=20, min_count=50, workers=8)
+
+    speeches, words = stratum_counts(inpath, 'H')
+    rate = measure_rate(inpath, 'H', speeches, bigram=phrasers[0], trigram=phrasers[1], **params)
+    fraction = sample_fraction(sum(words.values()), rate, budget, epochs=5)
+    print("Measured %0.0f words/sec; sampling %0.2f%% of the corpus." %(rate, 100*fraction))
+    report = stratified_sample(inpath, outpath, 'H', fraction, speeches=speeches)
+    print("Sampled %d of %d speeches." %(report.sampled.sum(), report.speeches.sum()))
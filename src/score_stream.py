@@ -0,0 +1,166 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+#=====================================================================#
+#
+# Description:
+# Scores incoming speeches on the first (or second) dimension used
+# by Explore. Texts are grouped into micro-batches; each batch is
+# cleaned, phrased and passed to infer_vector by a pool of worker
+# processes sharing a memory-mapped copy of the model, then projected
+# on the PCA or guided axis. Results are memoized by a hash of the
+# text, and latencies are recorded for monitoring.
+#
+# Usage:
+# scorer = SpeechScorer(Explore(model='House'), MODEL_PATH + 'house200')
+# future = scorer.submit("Mr. Speaker, I rise today...")
+# future.result()
+# scorer.metrics()
+#
+#=====================================================================#
+
+import time
+import queue
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from multiprocessing import Pool
+from gensim.models.doc2vec import Doc2Vec
+from gensim.models.phrases import Phraser
+from preprocess import clean_text
+
+_model = None
+_phrasers = None
+
+def _init_worker(model_path, bigram_path, trigram_path):
+    global _model, _phrasers
+    _model = Doc2Vec.load(model_path, mmap='r')
+    _phrasers = [Phraser.load(p) for p in (bigram_path, trigram_path) if p]
+
+def _infer_batch(args):
+    texts, country, epochs = args
+    Z = np.zeros((len(texts), _model.vector_size), dtype=np.float32)
+    for i, text in enumerate(texts):
+        tokens = clean_text(text, country).split()
+        for phraser in _phrasers:
+            tokens = phraser[tokens]
+        Z[i,:] = _model.infer_vector(tokens, epochs=epochs)
+    return Z
+
+class SpeechScorer(object):
+
+    def __init__(self, explore, model_path, bigram_path=None, trigram_path=None, dimension=1,
+                 workers=4, batch_size=32, max_wait=0.05, cache_size=100000, epochs=None):
+
+        self.explore = explore
+        self.dimension = dimension
+        self.country = explore.country
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.cache_size = cache_size
+        self.epochs = epochs
+        self.cache = OrderedDict()
+        self.latencies = deque(maxlen=100000)
+        self.batches = 0
+        self.hits = 0
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.pool = Pool(processes=workers, initializer=_init_worker, initargs=(model_path, bigram_path, trigram_path))
+        self.in_flight = threading.BoundedSemaphore(2*workers)
+        self.running = True
+        self.thread = threading.Thread(target=self.loop, daemon=True)
+        self.thread.start()
+
+    def key(self, text):
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def submit(self, text):
+        future = Future()
+        k = self.key(text)
+        with self.lock:
+            if k in self.cache:
+                self.cache.move_to_end(k)
+                self.hits += 1
+                self.latencies.append(0.0)
+                future.set_result(self.cache[k])
+                return future
+        self.queue.put((time.time(), k, text, future))
+        return future
+
+    def score(self, texts):
+        return [f.result() for f in [self.submit(t) for t in texts]]
+
+    def next_batch(self):
+        # Blocks for the first item, then waits at most max_wait to fill the batch.
+        item = self.queue.get()
+        if item is None:
+            return []
+        batch = [item]
+        deadline = time.time() + self.max_wait
+        while len(batch) < self.batch_size:
+            try:
+                item = self.queue.get(timeout=max(0, deadline - time.time()))
+            except queue.Empty:
+                break
+            if item is None:
+                break
+            batch.append(item)
+        return batch
+
+    def loop(self):
+        while self.running:
+            batch = self.next_batch()
+            if batch:
+                self.dispatch(batch)
+
+    def dispatch(self, batch):
+        # Texts repeated within the batch are inferred once. At most two batches per
+        # worker are in flight; beyond that, the queue of incoming texts grows instead.
+        unique = OrderedDict((k, text) for _, k, text, _ in batch)
+        keys = list(unique.keys())
+        self.in_flight.acquire()
+        self.pool.apply_async(_infer_batch, ((list(unique.values()), self.country, self.epochs),),
+                              callback=lambda Z: self.complete(Z, keys, batch),
+                              error_callback=lambda e: self.fail(e, batch))
+
+    def fail(self, e, batch):
+        self.in_flight.release()
+        for _, _, _, future in batch:
+            future.set_exception(e)
+
+    def complete(self, Z, keys, batch):
+        try:
+            scores = self.explore.project(Z)[:, self.dimension-1]
+        except Exception as e:
+            self.fail(e, batch)
+            return
+        self.in_flight.release()
+        scores = dict(zip(keys, scores.tolist()))
+        now = time.time()
+        with self.lock:
+            for k, s in scores.items():
+                self.cache[k] = s
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+            self.batches += 1
+            for t0, k, _, future in batch:
+                self.latencies.append(now - t0)
+                future.set_result(scores[k])
+
+    def metrics(self):
+        with self.lock:
+            lat = np.array(self.latencies)
+            n = len(lat)
+            return {'requests': n, 'cache_hits': self.hits, 'batches': self.batches,
+                    'mean_latency': lat.mean() if n else np.nan,
+                    'p50_latency': np.percentile(lat, 50) if n else np.nan,
+                    'p95_latency': np.percentile(lat, 95) if n else np.nan}
+
+    def close(self):
+        self.running = False
+        self.queue.put(None)
+        self.thread.join()
+        self.pool.close()
+        self.pool.join()
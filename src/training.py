@@ -0,0 +1,119 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+#=====================================================================#
+#
+# Description:
+# A training harness for Doc2Vec models. The model is trained one
+# epoch at a time with the same linear learning rate decay as a single
+# call to train(), saved after each epoch, and can resume from the
+# last checkpoint after a crash. Throughput, learning rate and elapsed
+# time are logged to a metrics file; optionally, the correlation with
+# the gold standard is computed after each epoch for early stopping,
+# and the best-scoring model is kept and returned.
+#
+# Usage:
+# See partyembeddings_house.py.
+#
+#=====================================================================#
+
+import os
+import re
+import csv
+import time
+import logging
+from gensim.models.doc2vec import Doc2Vec
+
+METRICS = ['epoch', 'words', 'seconds', 'words_per_sec', 'start_alpha', 'end_alpha', 'elapsed', 'score']
+
+def checkpoint_path(checkpoint_dir, epoch):
+    return os.path.join(checkpoint_dir, 'checkpoint_%03d' % epoch)
+
+def best_checkpoint_path(checkpoint_dir):
+    return os.path.join(checkpoint_dir, 'checkpoint_best')
+
+def latest_checkpoint(checkpoint_dir):
+    if not os.path.isdir(checkpoint_dir):
+        return 0
+    epochs = [int(m.group(1)) for m in (re.match(r'^checkpoint_(\d+)$', f) for f in os.listdir(checkpoint_dir)) if m]
+    return max(epochs) if epochs else 0
+
+def read_metrics(metrics_path):
+    if not metrics_path or not os.path.exists(metrics_path):
+        return []
+    with open(metrics_path, 'r') as f:
+        return list(csv.DictReader(f))
+
+def validation_score(model, country='USA', chamber='House', method='pca'):
+    # First Pearson correlation reported by Validate (voteview or rile).
+    from partyembed.validate import Validate
+    return Validate(model, country, method=method, chamber=chamber, boot=False).correlation[0][1]
+
+def train_with_checkpoints(model, corpus, checkpoint_dir, metrics_path=None, epochs=None,
+                           validate=False, country='USA', chamber='House', patience=2, min_delta=0.001, keep=2):
+
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    epochs = epochs or model.epochs
+    start = latest_checkpoint(checkpoint_dir)
+    if start > 0:
+        logging.info("Resuming from %s" % checkpoint_path(checkpoint_dir, start))
+        model = Doc2Vec.load(checkpoint_path(checkpoint_dir, start))
+
+    history = read_metrics(metrics_path)
+    scores = [float(r['score']) for r in history if r['score'] not in ('', None)]
+    best = max(scores) if scores else None
+    stale = 0
+    elapsed = float(history[-1]['elapsed']) if history else 0.0
+
+    # train() overwrites model.alpha and model.min_alpha, so the original schedule is kept
+    # on the model itself and saved with every checkpoint.
+    alpha, min_alpha = getattr(model, 'alpha_schedule', (model.alpha, model.min_alpha))
+    model.alpha_schedule = (alpha, min_alpha)
+    for epoch in range(start, epochs):
+        # Linear decay over the full run, as in a single call to train().
+        start_alpha = alpha - (alpha - min_alpha) * epoch / epochs
+        end_alpha = alpha - (alpha - min_alpha) * (epoch + 1) / epochs
+        t0 = time.time()
+        result = model.train(corpus, total_examples=model.corpus_count, epochs=1,
+                             start_alpha=start_alpha, end_alpha=end_alpha)
+        seconds = time.time() - t0
+        elapsed += seconds
+        words = result[0] if isinstance(result, tuple) else getattr(model, 'corpus_total_words', 0)
+
+        score = ''
+        if validate:
+            score = validation_score(model, country=country, chamber=chamber)
+            if best is None or score > best + min_delta:
+                best = score
+                stale = 0
+                # Kept apart from the rolling checkpoints, which may delete the best epoch.
+                model.save(best_checkpoint_path(checkpoint_dir))
+            else:
+                stale += 1
+
+        model.save(checkpoint_path(checkpoint_dir, epoch + 1))
+        old = checkpoint_path(checkpoint_dir, epoch + 1 - keep)
+        if epoch + 1 - keep > 0 and os.path.exists(old):
+            for f in os.listdir(checkpoint_dir):
+                if f.startswith(os.path.basename(old)):
+                    os.remove(os.path.join(checkpoint_dir, f))
+
+        if metrics_path:
+            new_file = not os.path.exists(metrics_path)
+            with open(metrics_path, 'a') as out_:
+                writer = csv.writer(out_)
+                if new_file:
+                    writer.writerow(METRICS)
+                writer.writerow([epoch + 1, words, '%0.2f' % seconds, '%0.1f' % (words / max(seconds, 1e-9)),
+                                 start_alpha, end_alpha, '%0.2f' % elapsed, score])
+        logging.info("Epoch %d: %d words in %0.1fs (%0.0f words/s), alpha %0.5f, score %s"
+                     % (epoch + 1, words, seconds, words / max(seconds, 1e-9), end_alpha, score))
+
+        if validate and stale >= patience:
+            logging.info("Stopping early: no improvement in validation score for %d epochs." % patience)
+            break
+    if validate and os.path.exists(best_checkpoint_path(checkpoint_dir)):
+        logging.info("Returning the best model (score %s)" % best)
+        model = Doc2Vec.load(best_checkpoint_path(checkpoint_dir))
+    model.alpha, model.min_alpha = alpha, min_alpha
+    return model
@@ -0,0 +1,17 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('gensim')
+
+from partyembed.utils.aggregate import SpeechAggregate
+
+def test_save_load_roundtrip(tmp_path):
+    agg = SpeechAggregate(vector_size=3)
+    agg.add(['D_114', 'R_114', 'D_114'], np.arange(9).reshape(3, 3), weights=[1, 2, 3])
+    for path in [str(tmp_path / 'agg'), str(tmp_path / 'agg.npz')]:
+        agg.save(path)
+        loaded = SpeechAggregate.load(path)
+        assert loaded.tags == agg.tags
+        assert np.allclose(loaded.sums, agg.sums)
+        assert np.allclose(loaded.weights, agg.weights)
+        assert np.allclose(loaded.vectors()['D_114'], agg.vectors()['D_114'])